@@ -0,0 +1,178 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+class IVFIndex:
+    """Inverted-file approximate nearest-neighbour index over unit-length vectors.
+
+    Vectors are clustered with spherical k-means into ``n_lists`` lists. A query
+    is compared with the centroids, and only the rows in the ``nprobe`` closest
+    lists are scored exactly. Raising ``nprobe`` trades latency for recall.
+    """
+
+    def __init__(self, centroids: np.ndarray, offsets: np.ndarray, rows: np.ndarray, generation: str = ""):
+        self.centroids = centroids
+        self.offsets = offsets
+        self.rows = rows
+        self.generation = generation
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(cls, matrix: np.ndarray, n_lists: int = 0, n_iter: int = 10,
+              generation: str = "", seed: int = 0) -> "IVFIndex":
+        """Cluster the rows of a normalized matrix and build the inverted lists."""
+        n = matrix.shape[0]
+        if n_lists <= 0:
+            n_lists = max(1, int(4 * np.sqrt(n)))
+        n_lists = min(n_lists, n)
+
+        start_time = time.time()
+        rng = np.random.default_rng(seed)
+
+        # Train on a sample; 64 points per list is plenty for stable centroids
+        sample_size = min(n, n_lists * 64)
+        sample = np.asarray(matrix[np.sort(rng.choice(n, sample_size, replace=False))], dtype=np.float32)
+        centroids = sample[rng.choice(sample_size, n_lists, replace=False)].copy()
+
+        for _ in range(n_iter):
+            assignments = _assign(sample, centroids)
+            sums = np.zeros_like(centroids)
+            np.add.at(sums, assignments, sample)
+            norms = np.linalg.norm(sums, axis=1, keepdims=True)
+            empty = norms[:, 0] == 0
+            # Re-seed empty lists with random sample points
+            sums[empty] = sample[rng.choice(sample_size, int(empty.sum()))]
+            norms[empty] = 1.0
+            centroids = (sums / norms).astype(np.float32)
+
+        assignments = _assign(matrix, centroids)
+        rows = np.argsort(assignments, kind='stable').astype(np.int64)
+        counts = np.bincount(assignments, minlength=n_lists)
+        offsets = np.concatenate([[0], np.cumsum(counts)]).astype(np.int64)
+
+        logger.info(f"Built IVF index with {n_lists} lists over {n} vectors in {time.time() - start_time:.2f}s")
+        return cls(centroids, offsets, rows, generation)
+
+    def save(self, path: Path) -> None:
+        tmp_path = Path(path).with_suffix(".tmp.npz")
+        np.savez(tmp_path, centroids=self.centroids, offsets=self.offsets, rows=self.rows,
+                 generation=np.array(self.generation))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> "IVFIndex":
+        with np.load(path) as data:
+            return cls(data["centroids"], data["offsets"], data["rows"], str(data["generation"]))
+
+    def search(self, matrix: np.ndarray, query: np.ndarray, k: int = 5, nprobe: int = 16) -> List[Tuple[int, float]]:
+        """Return approximate top-k (row, score) pairs for a normalized query vector."""
+        nprobe = max(1, min(nprobe, self.n_lists))
+        centroid_scores = self.centroids @ query
+        if nprobe < self.n_lists:
+            probe = np.argpartition(-centroid_scores, nprobe - 1)[:nprobe]
+        else:
+            probe = np.arange(self.n_lists)
+
+        candidates = np.sort(np.concatenate([self.rows[self.offsets[l]:self.offsets[l + 1]] for l in probe]))
+        if len(candidates) == 0:
+            return []
+
+        scores = matrix[candidates] @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k] if k < len(scores) else np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(candidates[i]), float(scores[i])) for i in top]
+
+def _assign(matrix: np.ndarray, centroids: np.ndarray, block_size: int = 65536) -> np.ndarray:
+    """Assign each row to its most similar centroid, in blocks to bound memory."""
+    assignments = np.empty(matrix.shape[0], dtype=np.int64)
+    for start in range(0, matrix.shape[0], block_size):
+        block = np.asarray(matrix[start:start + block_size], dtype=np.float32)
+        assignments[start:start + block_size] = np.argmax(block @ centroids.T, axis=1)
+    return assignments
+
+def recall_at_k(matrix: np.ndarray, index: IVFIndex, k: int = 10, nprobe: int = 16,
+                num_queries: int = 200, seed: int = 0) -> Dict[str, Any]:
+    """Measure recall@k and latency of the IVF index against exact search.
+
+    Queries are stored vectors with a little noise added, so they resemble
+    real queries that land near, but not on, indexed chunks.
+    """
+    rng = np.random.default_rng(seed)
+    picks = rng.choice(matrix.shape[0], min(num_queries, matrix.shape[0]), replace=False)
+    queries = np.asarray(matrix[picks], dtype=np.float32)
+    queries += rng.normal(scale=0.05, size=queries.shape).astype(np.float32)
+    queries /= np.linalg.norm(queries, axis=1, keepdims=True)
+
+    hits = 0
+    exact_time = 0.0
+    ann_time = 0.0
+    for query in queries:
+        start_time = time.perf_counter()
+        scores = matrix @ query
+        exact = set(np.argpartition(-scores, k - 1)[:k].tolist())
+        exact_time += time.perf_counter() - start_time
+
+        start_time = time.perf_counter()
+        approx = {row for row, _ in index.search(matrix, query, k, nprobe)}
+        ann_time += time.perf_counter() - start_time
+
+        hits += len(exact & approx)
+
+    return {
+        "k": k,
+        "nprobe": nprobe,
+        "queries": len(queries),
+        "recall": hits / (k * len(queries)),
+        "exact_ms": 1000 * exact_time / len(queries),
+        "ann_ms": 1000 * ann_time / len(queries)
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark IVF approximate search recall@k against exact search")
+    parser.add_argument("--store_dir", type=str, help="Directory containing the embedding store")
+    parser.add_argument("--model", type=str, default="granite3.2:8b-instruct-fp16",
+                        help="Model whose embedding store to benchmark")
+    parser.add_argument("--synthetic", type=int, default=0,
+                        help="Benchmark on N random clustered vectors instead of a store")
+    parser.add_argument("--dim", type=int, default=768, help="Dimensions for synthetic vectors")
+    parser.add_argument("--n_lists", type=int, default=0, help="Number of IVF lists (0 = 4 * sqrt(N))")
+    parser.add_argument("--nprobe", type=str, default="1,4,16,64", help="Comma-separated nprobe values to try")
+    parser.add_argument("--k", type=int, default=10, help="Number of neighbours")
+    parser.add_argument("--queries", type=int, default=200, help="Number of benchmark queries")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    if args.synthetic:
+        rng = np.random.default_rng(0)
+        centers = rng.normal(size=(max(1, args.synthetic // 500), args.dim))
+        matrix = centers[rng.integers(0, len(centers), args.synthetic)] + rng.normal(scale=0.5, size=(args.synthetic, args.dim))
+        matrix = (matrix / np.linalg.norm(matrix, axis=1, keepdims=True)).astype(np.float32)
+    elif args.store_dir:
+        from embedding_store import EmbeddingStore
+        store = EmbeddingStore(Path(args.store_dir), args.model)
+        if not store.load():
+            print(f"No embedding store for {args.model} in {args.store_dir}")
+            return
+        matrix = store.matrix
+    else:
+        parser.error("Either --store_dir or --synthetic is required")
+
+    index = IVFIndex.build(matrix, n_lists=args.n_lists)
+    print(f"{'nprobe':>8} {'recall@' + str(args.k):>10} {'exact ms':>10} {'ann ms':>10}")
+    for nprobe in [int(p) for p in args.nprobe.split(',')]:
+        result = recall_at_k(matrix, index, args.k, nprobe, args.queries)
+        print(f"{nprobe:>8} {result['recall']:>10.3f} {result['exact_ms']:>10.2f} {result['ann_ms']:>10.2f}")
+
+if __name__ == "__main__":
+    main()
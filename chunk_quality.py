@@ -0,0 +1,135 @@
+import argparse
+import logging
+import math
+import re
+import time
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+# Docling placeholders and glyph escapes, and table-of-contents dot leaders
+PLACEHOLDER_PATTERN = re.compile(r"<!--.*?-->|GLYPH&lt;[^&]*&gt;|GLYPH<[^>]*>")
+LEADER_PATTERN = re.compile(r"(?:\. ?){4,}")
+WORD_PATTERN = re.compile(r"\w+")
+
+# Chunks with fewer words than this lose score in proportion
+MIN_WORDS = 20
+
+def text_features(texts: List[str]) -> Dict[str, np.ndarray]:
+    """Per-chunk features, computed over all texts at once where possible.
+
+    Character classes are counted on one code-point array of the whole batch
+    with running sums; placeholders, dot leaders and word statistics
+    come from regular expressions.
+    """
+    n = len(texts)
+    lengths = np.fromiter((len(text) for text in texts), dtype=np.int64, count=n)
+    starts = np.concatenate(([0], np.cumsum(lengths)[:-1])) if n else np.zeros(0, dtype=np.int64)
+
+    codes = np.frombuffer("".join(texts).encode('utf-32-le'), dtype=np.uint32)
+    is_space = np.isin(codes, (9, 10, 13, 32))
+    is_digit = (codes >= 48) & (codes <= 57)
+    is_alpha = ((codes | 32) >= 97) & ((codes | 32) <= 122) | (codes >= 192)
+    # Table borders and rules are layout, not punctuation
+    is_markup = np.isin(codes, (ord('|'), ord('-')))
+    is_punct = ~(is_space | is_digit | is_alpha | is_markup)
+
+    def per_chunk(mask: np.ndarray) -> np.ndarray:
+        # Differences of a running count give every chunk's total in one step
+        running = np.concatenate(([0], np.cumsum(mask, dtype=np.int64)))
+        return running[starts + lengths] - running[starts]
+
+    visible = np.maximum(lengths - per_chunk(is_space) - per_chunk(is_markup), 1)
+    placeholder_chars = np.array([sum(len(m) for m in PLACEHOLDER_PATTERN.findall(text)) for text in texts], dtype=np.float64)
+    leader_chars = np.array([sum(len(m) for m in LEADER_PATTERN.findall(text)) for text in texts], dtype=np.float64)
+
+    word_counts = np.zeros(n, dtype=np.float64)
+    entropies = np.zeros(n, dtype=np.float64)
+    for i, text in enumerate(texts):
+        counts = Counter(word.lower() for word in WORD_PATTERN.findall(PLACEHOLDER_PATTERN.sub(" ", text)))
+        total = sum(counts.values())
+        word_counts[i] = total
+        if total > 1:
+            p = np.fromiter(counts.values(), dtype=np.float64) / total
+            # Normalized so a text of all-distinct words scores 1
+            entropies[i] = float(-(p * np.log2(p)).sum()) / math.log2(total)
+
+    safe_lengths = np.maximum(lengths, 1)
+    return {
+        "placeholder_ratio": placeholder_chars / safe_lengths,
+        "leader_ratio": leader_chars / safe_lengths,
+        "alphanumeric_ratio": per_chunk(is_alpha | is_digit) / visible,
+        "punctuation_density": per_chunk(is_punct) / visible,
+        "token_entropy": entropies,
+        "words": word_counts
+    }
+
+def quality_scores(texts: List[str]) -> np.ndarray:
+    """Score chunks from 0 (junk) to 1 (ordinary prose).
+
+    The share of the text that is not placeholders or dot leaders scales a
+    weighted mean of alphanumeric ratio, punctuation density, token entropy and
+    length, each mapped to 0-1.
+    """
+    if not texts:
+        return np.zeros(0)
+    f = text_features(texts)
+    content = np.clip(1 - f["placeholder_ratio"] - f["leader_ratio"], 0, 1)
+    alphanumeric = np.clip(f["alphanumeric_ratio"] / 0.75, 0, 1)
+    punctuation = np.clip(1 - (f["punctuation_density"] - 0.15) / 0.35, 0, 1)
+    entropy = np.clip(f["token_entropy"] / 0.8, 0, 1)
+    length = np.clip(f["words"] / MIN_WORDS, 0, 1)
+    score = content * (0.3 * alphanumeric + 0.3 * punctuation + 0.2 * entropy + 0.2 * length)
+    return np.where(f["words"] > 0, score, 0.0)
+
+def filter_chunks(chunks: List[Dict[str, Any]], min_score: float = 0.7,
+                  action: str = "drop") -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Score chunks and drop those below ``min_score``, or keep them with the score attached.
+
+    With ``action="downweight"`` every chunk is kept and carries a ``quality``
+    score that retrieval can multiply into its ranking. Returns the chunks and
+    a report.
+    """
+    scores = quality_scores([chunk["content"] for chunk in chunks])
+    low = scores < min_score
+    report = {
+        "chunks": len(chunks),
+        "low_quality": int(low.sum()),
+        "mean_score": float(scores.mean()) if len(scores) else 0.0,
+        "characters_low_quality": int(sum(len(chunk["content"]) for chunk, is_low in zip(chunks, low) if is_low))
+    }
+
+    if action == "downweight":
+        return [{**chunk, "quality": float(score)} for chunk, score in zip(chunks, scores)], report
+    return [chunk for chunk, is_low in zip(chunks, low) if not is_low], report
+
+def main():
+    parser = argparse.ArgumentParser(description="Score chunk quality and show what a threshold would drop")
+    parser.add_argument("--chunks_dir", type=str, default="processed_redbooks/chunks",
+                        help="Directory containing chunk shards or chunk files")
+    parser.add_argument("--min_score", type=float, default=0.7, help="Minimum quality score to keep")
+    parser.add_argument("--samples", type=int, default=5, help="Number of lowest-scoring chunks to print")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from chunk_store import load_chunks
+    chunks = load_chunks(Path(args.chunks_dir))
+    start_time = time.time()
+    scores = quality_scores([chunk["content"] for chunk in chunks])
+    elapsed = time.time() - start_time
+
+    low = scores < args.min_score
+    print(f"Scored {len(chunks)} chunks in {elapsed:.2f} seconds; mean score {scores.mean():.2f}")
+    print(f"Below {args.min_score}: {int(low.sum())} chunks "
+          f"({sum(len(c['content']) for c, is_low in zip(chunks, low) if is_low) / 1e6:.2f} M characters not embedded)")
+    print("Score histogram:", np.histogram(scores, bins=10, range=(0, 1))[0].tolist())
+    for i in np.argsort(scores)[:args.samples]:
+        print(f"  {scores[i]:.2f}: {' '.join(chunks[i]['content'].split())[:90]}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,355 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import time
+from functools import lru_cache
+from pathlib import Path
+from typing import List, Dict, Any, Iterator, Iterable, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# One shard per document: <document>.chunks.jsonl, with a <document>.chunks.jsonl.idx offset index
+SHARD_SUFFIX = ".chunks.jsonl"
+INDEX_SUFFIX = ".idx"
+INDEX_VERSION = 1
+
+# Document-level metadata lives once in metadata.json next to the shard; chunks keep only these fields
+METADATA_FILE = "metadata.json"
+CHUNK_METADATA_FIELDS = ("chunk_number", "word_count", "page_start", "page_end")
+
+def shard_path(directory: Path, document: str) -> Path:
+    """Path of the chunk shard for ``document`` inside ``directory``."""
+    return Path(directory) / f"{document}{SHARD_SUFFIX}"
+
+def shard_document(path: Path) -> str:
+    """Document name a shard belongs to."""
+    return Path(path).name[:-len(SHARD_SUFFIX)]
+
+class ChunkShardWriter:
+    """Append chunk records to a JSONL shard, one JSON object per line.
+
+    The byte offset and id of every record are collected as it is written and
+    saved to the ``.idx`` sidecar on close, so readers can seek straight to a
+    chunk. Without ``append`` the shard is written to a temporary file and
+    swapped in atomically, so readers never see a half-written document.
+    """
+
+    def __init__(self, path: Path, append: bool = False):
+        self.path = Path(path)
+        self.append = append and self.path.exists()
+        if self.append:
+            existing = ChunkShard(self.path)
+            self.ids = list(existing.ids)
+            self.offsets = list(existing.offsets)
+            self._write_path = self.path
+            self._file = open(self.path, 'ab')
+        else:
+            self.ids = []
+            self.offsets = []
+            self._write_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            self._file = open(self._write_path, 'wb')
+
+    def __enter__(self) -> "ChunkShardWriter":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._file.close()
+            if not self.append:
+                self._write_path.unlink(missing_ok=True)
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def write(self, record: Dict[str, Any]) -> int:
+        """Append one record (it must have an ``id``) and return its position in the shard."""
+        self.offsets.append(self._file.tell())
+        self.ids.append(record["id"])
+        self._file.write(json.dumps(record, ensure_ascii=False).encode('utf-8') + b"\n")
+        return len(self.offsets) - 1
+
+    def close(self) -> None:
+        self._file.close()
+        if self._write_path != self.path:
+            os.replace(self._write_path, self.path)
+        save_index(self.path, self.ids, self.offsets)
+
+def save_index(path: Path, ids: List[str], offsets: List[int]) -> None:
+    """Write the offset index for a shard, replacing any existing one atomically."""
+    index_path = Path(str(path) + INDEX_SUFFIX)
+    tmp_path = index_path.with_suffix(index_path.suffix + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump({
+            "version": INDEX_VERSION,
+            "size": os.path.getsize(path),
+            "ids": ids,
+            "offsets": offsets
+        }, f)
+    os.replace(tmp_path, index_path)
+
+def write_shard(path: Path, records: Iterable[Dict[str, Any]]) -> int:
+    """Write ``records`` as a fresh shard and return the number written."""
+    with ChunkShardWriter(path) as writer:
+        for record in records:
+            writer.write(record)
+    return len(writer)
+
+class ChunkShard:
+    """Read access to one JSONL chunk shard.
+
+    The offset index is loaded from the sidecar when it matches the shard. A
+    missing index is rebuilt by scanning the shard once. When the shard has
+    grown through appends, only the new tail is scanned.
+    """
+
+    def __init__(self, path: Path):
+        self.path = Path(path)
+        self.document = shard_document(self.path)
+        self.ids: List[str] = []
+        self.offsets: List[int] = []
+        self._positions: Optional[Dict[str, int]] = None
+        self._load_index()
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def _load_index(self) -> None:
+        index_path = Path(str(self.path) + INDEX_SUFFIX)
+        size = os.path.getsize(self.path)
+        indexed_size = 0
+        if index_path.exists():
+            try:
+                with open(index_path, 'r', encoding='utf-8') as f:
+                    index = json.load(f)
+                if index.get("version") == INDEX_VERSION and index["size"] <= size:
+                    self.ids = index["ids"]
+                    self.offsets = index["offsets"]
+                    indexed_size = index["size"]
+            except Exception as e:
+                logger.warning(f"Rebuilding unreadable chunk index {index_path}: {str(e)}")
+
+        if indexed_size < size:
+            self._scan(indexed_size)
+            try:
+                save_index(self.path, self.ids, self.offsets)
+            except OSError as e:
+                logger.warning(f"Could not save chunk index for {self.path}: {str(e)}")
+
+    def _scan(self, start: int) -> None:
+        """Index the records from byte ``start`` to the end of the shard."""
+        with open(self.path, 'rb') as f:
+            f.seek(start)
+            offset = start
+            for line in f:
+                if line.strip():
+                    self.offsets.append(offset)
+                    self.ids.append(json.loads(line)["id"])
+                offset += len(line)
+
+    def __getitem__(self, position: int) -> Dict[str, Any]:
+        """Read the record at ``position`` with a single seek."""
+        with open(self.path, 'rb') as f:
+            f.seek(self.offsets[position])
+            return self._chunk(json.loads(f.readline()))
+
+    def get(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Read the record with the given id, or None if the shard has no such chunk."""
+        if self._positions is None:
+            self._positions = {chunk_id: position for position, chunk_id in enumerate(self.ids)}
+        position = self._positions.get(chunk_id)
+        return self[position] if position is not None else None
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        """Stream every record in order."""
+        with open(self.path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    yield self._chunk(json.loads(line))
+
+    def _chunk(self, record: Dict[str, Any]) -> Dict[str, Any]:
+        return {"document": self.document, "file_path": str(self.path), **record}
+
+def _legacy_document(chunk_file: Path) -> str:
+    """Document name for a per-chunk file in any of the older directory layouts."""
+    parent = chunk_file.parent
+    # chunks/<doc>/<doc>_chunks/chunk_*.txt and <doc>/chunks/chunk_*.json
+    if parent.name == "chunks" or parent.name.endswith("_chunks"):
+        return parent.parent.name
+    # chunks/<doc>/chunk_*.txt
+    return parent.name
+
+def _read_legacy_chunk(chunk_file: Path) -> Dict[str, Any]:
+    """Read one per-chunk .txt or .json file into a chunk record."""
+    with open(chunk_file, 'r', encoding='utf-8') as f:
+        if chunk_file.suffix == ".json":
+            record = json.load(f)
+        else:
+            record = {"content": f.read()}
+    return {"id": chunk_file.stem, **record}
+
+def _legacy_shard_path(chunk_file: Path) -> Path:
+    """Shard that replaces a per-chunk file: next to the directory holding it."""
+    return shard_path(chunk_file.parent.parent, _legacy_document(chunk_file))
+
+def find_chunk_sources(root: Path, exclude: Iterable[Path] = ()) -> Dict[Path, List[Path]]:
+    """Walk ``root`` once and map each shard path to the legacy chunk files it stands for.
+
+    Existing shards map to an empty list; documents that have a shard ignore
+    any per-chunk files left next to it. Directories in ``exclude`` are skipped.
+    """
+    excluded = {Path(path).resolve() for path in exclude}
+    shards = set()
+    legacy: Dict[Path, List[Path]] = {}
+    for dirpath, dirnames, filenames in os.walk(root):
+        dirnames[:] = sorted(name for name in dirnames if (Path(dirpath) / name).resolve() not in excluded)
+        for filename in filenames:
+            path = Path(dirpath) / filename
+            if filename.endswith(SHARD_SUFFIX):
+                shards.add(path)
+            elif filename.startswith("chunk_") and path.suffix in (".txt", ".json"):
+                legacy.setdefault(_legacy_shard_path(path), []).append(path)
+
+    sources = {path: [] for path in shards}
+    for path, chunk_files in legacy.items():
+        if path not in sources:
+            sources[path] = sorted(chunk_files)
+    return dict(sorted(sources.items(), key=lambda item: (shard_document(item[0]), str(item[0]))))
+
+def iter_source(path: Path, chunk_files: List[Path]) -> Iterator[Dict[str, Any]]:
+    """Yield the chunks of one source from find_chunk_sources: a shard, or its legacy per-chunk files."""
+    if not chunk_files:
+        yield from ChunkShard(path)
+        return
+    for chunk_file in chunk_files:
+        try:
+            yield {"document": shard_document(path), "file_path": str(chunk_file), **_read_legacy_chunk(chunk_file)}
+        except Exception as e:
+            logger.error(f"Error reading chunk file {chunk_file}: {str(e)}")
+
+def source_hash(path: Path, chunk_files: List[Path]) -> str:
+    """BLAKE2 hash of the raw bytes behind one source and its metadata.json, to tell whether a document changed.
+
+    Reading bytes is much cheaper than parsing the chunks, so exporters can
+    skip unchanged documents without decoding them.
+    """
+    hasher = hashlib.blake2b(digest_size=16)
+    metadata_file = Path(path).parent / METADATA_FILE
+    files = (chunk_files or [path]) + ([metadata_file] if metadata_file.exists() else [])
+    for file_path in files:
+        hasher.update(Path(file_path).name.encode('utf-8') + b"\0")
+        with open(file_path, 'rb') as f:
+            buf = f.read(1 << 20)
+            while len(buf) > 0:
+                hasher.update(buf)
+                buf = f.read(1 << 20)
+    return hasher.hexdigest()
+
+def split_metadata(metadata: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Split a full chunk metadata dict into (document-level, chunk-local) fields."""
+    document = {key: value for key, value in metadata.items() if key not in CHUNK_METADATA_FIELDS}
+    chunk = {key: value for key, value in metadata.items() if key in CHUNK_METADATA_FIELDS}
+    return document, chunk
+
+def document_metadata(source: Path) -> Dict[str, Any]:
+    """Document metadata for a source from find_chunk_sources, read from its metadata.json.
+
+    Returns an empty dict when the document has none. Reads are cached by the
+    file's size and mtime, so a re-ingested document is picked up by a
+    long-running process. Callers must not modify the result, which is shared.
+    """
+    metadata_file = Path(source).parent / METADATA_FILE
+    try:
+        stat = os.stat(metadata_file)
+    except OSError:
+        return {}
+    return _read_document_metadata(metadata_file, stat.st_mtime_ns, stat.st_size)
+
+@lru_cache(maxsize=256)
+def _read_document_metadata(metadata_file: Path, mtime_ns: int, size: int) -> Dict[str, Any]:
+    try:
+        with open(metadata_file, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except Exception as e:
+        logger.error(f"Error reading document metadata {metadata_file}: {str(e)}")
+        return {}
+
+def chunk_source(chunk: Dict[str, Any]) -> Path:
+    """The source (shard path) a loaded chunk came from."""
+    file_path = Path(chunk["file_path"])
+    return file_path if file_path.name.endswith(SHARD_SUFFIX) else _legacy_shard_path(file_path)
+
+def chunk_metadata(chunk: Dict[str, Any]) -> Dict[str, Any]:
+    """Full metadata of a chunk: its document's metadata overlaid with the chunk's own fields.
+
+    Chunks are stored and loaded with chunk-local metadata only; this
+    rehydrates it on demand. Chunks written before metadata was normalized
+    still carry everything and come back unchanged.
+    """
+    return {**document_metadata(chunk_source(chunk)), **chunk.get("metadata", {})}
+
+def iter_chunks(root: Path, exclude: Iterable[Path] = ()) -> Iterator[Dict[str, Any]]:
+    """Yield every chunk under ``root`` in document order.
+
+    Shards are streamed; documents that were processed before shards existed
+    are read from their per-chunk files, so old and new trees load the same way.
+    Each chunk has ``document``, ``id``, ``content`` and ``file_path`` plus any
+    extra fields stored with it.
+    """
+    for path, chunk_files in find_chunk_sources(Path(root), exclude).items():
+        yield from iter_source(path, chunk_files)
+
+def load_chunks(root: Path, exclude: Iterable[Path] = ()) -> List[Dict[str, Any]]:
+    """Load every chunk under ``root`` into a list."""
+    chunks = list(iter_chunks(root, exclude))
+    logger.info(f"Loaded {len(chunks)} chunks from {len(set(chunk['document'] for chunk in chunks))} documents")
+    return chunks
+
+def migrate(root: Path, remove_legacy: bool = False) -> Dict[str, int]:
+    """Convert per-chunk files under ``root`` into one shard per document."""
+    stats = {"documents": 0, "chunks": 0, "removed_files": 0}
+    for path, chunk_files in find_chunk_sources(Path(root)).items():
+        if not chunk_files:
+            continue
+        stats["chunks"] += write_shard(path, (_read_legacy_chunk(chunk_file) for chunk_file in chunk_files))
+        stats["documents"] += 1
+        logger.info(f"Wrote {path} with {len(chunk_files)} chunks")
+
+        if remove_legacy:
+            for chunk_file in chunk_files:
+                chunk_file.unlink()
+                stats["removed_files"] += 1
+    return stats
+
+def main():
+    parser = argparse.ArgumentParser(description="Convert per-chunk files into JSONL shards and compare load times")
+    parser.add_argument("--root", type=str, default="processed_redbooks",
+                        help="Directory to search for chunk files")
+    parser.add_argument("--remove_legacy", action="store_true",
+                        help="Delete the per-chunk files once their shard is written")
+    parser.add_argument("--benchmark", action="store_true",
+                        help="Only time loading all chunks, without converting anything")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    root = Path(args.root)
+
+    start_time = time.time()
+    chunks = load_chunks(root)
+    print(f"Loaded {len(chunks)} chunks in {time.time() - start_time:.3f} seconds")
+    if args.benchmark:
+        return
+
+    stats = migrate(root, args.remove_legacy)
+    print(f"Converted {stats['documents']} documents ({stats['chunks']} chunks), "
+          f"removed {stats['removed_files']} per-chunk files")
+
+    start_time = time.time()
+    chunks = load_chunks(root)
+    print(f"Loaded {len(chunks)} chunks from shards in {time.time() - start_time:.3f} seconds")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,247 @@
+import argparse
+import logging
+import re
+import time
+from collections import deque
+from functools import lru_cache
+from typing import List, Dict, Any, Iterable, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+def _words(page_texts: Iterable[Tuple[int, str]], max_word_size: int) -> Iterator[Tuple[str, int]]:
+    """Yield (word, page_no) pairs, splitting words too long to fit in any chunk."""
+    for page_no, text in page_texts:
+        for word in text.split():
+            if len(word) <= max_word_size:
+                yield word, page_no
+            else:
+                for start in range(0, len(word), max_word_size):
+                    yield word[start:start + max_word_size], page_no
+
+def stream_chunks(page_texts: Iterable[Tuple[int, str]], chunk_size: int = 1000, chunk_overlap: int = 200,
+                  min_chunk_size: int = 100, max_chunk_size: int = 2000) -> Iterator[Dict[str, Any]]:
+    """Chunk a stream of (page_no, text) pairs into overlapping word-aligned chunks.
+
+    Sizes are in characters, counting one separator per word. A chunk is
+    emitted once the next word would push it past ``chunk_size``; the words
+    in its last ``chunk_overlap`` characters start the next chunk. A chunk
+    below ``min_chunk_size`` keeps growing up to ``max_chunk_size``, which no
+    chunk exceeds, and is only emitted short when the next word would push it
+    past that; a final chunk shorter than ``min_chunk_size`` is dropped.
+    Only the current chunk is held in memory, so pages can come straight
+    from a PDF reader.
+
+    Yields dicts with ``text``, ``word_count``, ``page_start`` and ``page_end``.
+    """
+    chunk_size = max(1, min(chunk_size, max_chunk_size))
+    chunk_overlap = max(0, min(chunk_overlap, chunk_size - 1))
+
+    window: "deque[Tuple[str, int]]" = deque()
+    size = 0
+
+    def emit() -> Dict[str, Any]:
+        return {
+            "text": " ".join(word for word, _page in window),
+            "word_count": len(window),
+            "page_start": window[0][1],
+            "page_end": window[-1][1]
+        }
+
+    for word, page_no in _words(page_texts, max_chunk_size - 1):
+        word_size = len(word) + 1  # +1 for space
+        # Close the chunk when it is full; one still below the minimum may grow up to the maximum
+        if window and size + word_size > chunk_size and (size >= min_chunk_size or size + word_size > max_chunk_size):
+            # A chunk still below the minimum is emitted as is when the next word cannot join it
+            yield emit()
+
+            # Keep the trailing overlap, but never so much that the next word cannot fit
+            overlap_limit = min(chunk_overlap, chunk_size - word_size)
+            while window and size > overlap_limit:
+                size -= len(window.popleft()[0]) + 1
+
+        window.append((word, page_no))
+        size += word_size
+
+    # Save the last chunk if it meets minimum size
+    if window and size >= min_chunk_size:
+        yield emit()
+
+# Token-aware chunking for redbook-processor; blocks are (page_no, kind, text) with kind heading, text or table
+ESTIMATE_PATTERN = re.compile(r"\w+|[^\w\s]")
+LONG_WORD_PATTERN = re.compile(r"\w{7,}")
+SENTENCE_BREAK = re.compile(r"(?<=[.!?])\s+")
+PARAGRAPH_BREAK = re.compile(r"\n[ \t]*\n")
+
+class TokenCounter:
+    """Count tokens with a local Hugging Face tokenizer, or estimate them.
+
+    The tokenizer is only loaded from the local cache, never downloaded. When
+    transformers or the tokenizer files are missing, each word or punctuation
+    mark counts as one token per six characters, which slightly overestimates
+    BPE counts and so keeps chunks inside the context window.
+    """
+
+    def __init__(self, tokenizer_name: Optional[str] = None):
+        self.tokenizer = None
+        self.name = "estimate"
+        if tokenizer_name:
+            try:
+                from transformers import AutoTokenizer
+                self.tokenizer = AutoTokenizer.from_pretrained(tokenizer_name, local_files_only=True)
+                self.name = tokenizer_name
+            except Exception as e:
+                logger.info(f"Tokenizer {tokenizer_name} not available locally, estimating token counts: {str(e)}")
+
+    def count(self, text: str) -> int:
+        if self.tokenizer is not None:
+            return len(self.tokenizer.encode(text, add_special_tokens=False))
+        # One token per piece, plus one for every further six characters of a long word
+        extra = sum((len(word) - 1) // 6 for word in LONG_WORD_PATTERN.findall(text))
+        return len(ESTIMATE_PATTERN.findall(text)) + extra
+
+@lru_cache(maxsize=None)
+def get_token_counter(tokenizer_name: Optional[str] = None) -> TokenCounter:
+    """Shared TokenCounter per tokenizer name, so each process loads a tokenizer once."""
+    return TokenCounter(tokenizer_name)
+
+def _split_oversized(text: str, counter: TokenCounter, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Split a sentence longer than ``max_tokens`` at word boundaries, and words at characters."""
+    parts: List[str] = []
+    tokens = 0
+    for word in text.split():
+        word_tokens = counter.count(word)
+        if word_tokens > max_tokens:
+            step = max(1, len(word) * max_tokens // word_tokens)
+            pieces = [word[start:start + step] for start in range(0, len(word), step)]
+        else:
+            pieces = [word]
+        for piece in pieces:
+            piece_tokens = word_tokens if len(pieces) == 1 else counter.count(piece)
+            if parts and tokens + piece_tokens > max_tokens:
+                yield " ".join(parts), tokens
+                parts, tokens = [], 0
+            parts.append(piece)
+            tokens += piece_tokens
+    if parts:
+        yield " ".join(parts), tokens
+
+def _units(blocks: Iterable[Tuple[Optional[int], str, str]], counter: TokenCounter,
+           max_tokens: int) -> Iterator[Tuple[Optional[int], str, str, str, int]]:
+    """Split blocks into sentences (table rows for tables) of at most ``max_tokens`` tokens.
+
+    Yields (page_no, kind, separator, text, tokens); the separator is what joins
+    the unit to the one before it in a chunk.
+    """
+    for page_no, kind, text in blocks:
+        pieces = text.split("\n") if kind == "table" else SENTENCE_BREAK.split(text)
+        inner_separator = "\n" if kind == "table" else " "
+        separator = "\n\n"
+        for piece in pieces:
+            piece = piece.strip()
+            if not piece:
+                continue
+            tokens = counter.count(piece)
+            parts = [(piece, tokens)] if tokens <= max_tokens else _split_oversized(piece, counter, max_tokens)
+            for part, part_tokens in parts:
+                yield page_no, kind, separator, part, part_tokens
+                separator = inner_separator
+
+def chunk_blocks(blocks: Iterable[Tuple[Optional[int], str, str]], counter: TokenCounter,
+                 max_tokens: int = 256, overlap_tokens: int = 32) -> Iterator[Dict[str, Any]]:
+    """Chunk document blocks by token count in a single pass.
+
+    Chunks break between sentences, never inside one unless a sentence alone
+    exceeds ``max_tokens``. A heading starts a new chunk once the current one
+    has body text, so sections are not mixed. Within a section the trailing
+    sentences, up to ``overlap_tokens``, are repeated at the start of the next
+    chunk.
+
+    Yields dicts with ``text``, ``tokens``, ``page_start`` and ``page_end``.
+    """
+    max_tokens = max(1, max_tokens)
+    overlap_tokens = max(0, min(overlap_tokens, max_tokens // 2))
+
+    window: List[Tuple[Optional[int], str, str, str, int]] = []
+    tokens = 0
+    has_body = False  # The window holds text besides headings
+    fresh = False  # The window holds units not yet emitted
+
+    def emit() -> Dict[str, Any]:
+        return {
+            "text": window[0][3] + "".join(separator + text for _page, _kind, separator, text, _tokens in window[1:]),
+            "tokens": tokens,
+            "page_start": window[0][0],
+            "page_end": window[-1][0]
+        }
+
+    for unit in _units(blocks, counter, max_tokens):
+        page_no, kind, separator, text, unit_tokens = unit
+        new_section = kind == "heading" and has_body
+        if window and (new_section or tokens + unit_tokens > max_tokens):
+            if fresh:
+                yield emit()
+
+            # Carry the trailing sentences into the next chunk, unless a new section starts
+            keep = 0
+            budget = 0 if new_section else min(overlap_tokens, max_tokens - unit_tokens)
+            carried = 0
+            while keep < len(window) and carried + window[-1 - keep][4] <= budget:
+                carried += window[-1 - keep][4]
+                keep += 1
+            window = window[len(window) - keep:]
+            tokens = carried
+            has_body = any(kept[1] != "heading" for kept in window)
+            fresh = False
+
+        window.append(unit)
+        tokens += unit_tokens
+        has_body = has_body or kind != "heading"
+        fresh = True
+
+    if fresh:
+        yield emit()
+
+def text_blocks(text: str) -> Iterator[Tuple[Optional[int], str, str]]:
+    """Blocks from a Markdown or plain-text export: one per paragraph, without page numbers."""
+    for paragraph in PARAGRAPH_BREAK.split(text):
+        paragraph = paragraph.strip()
+        if not paragraph or paragraph.startswith("<!--"):
+            continue
+        if paragraph.startswith("#"):
+            yield None, "heading", paragraph.lstrip("#").strip()
+        elif paragraph.startswith("|"):
+            yield None, "table", paragraph
+        else:
+            yield None, "text", paragraph
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure token-aware chunking throughput on an exported document")
+    parser.add_argument("--text", type=str, default="processed_redbooks/docs/sg248951/sg248951.txt",
+                        help="Markdown or text export to chunk")
+    parser.add_argument("--tokenizer", type=str, help="Local Hugging Face tokenizer name (default: estimate)")
+    parser.add_argument("--max_tokens", type=int, default=256, help="Maximum tokens per chunk")
+    parser.add_argument("--overlap_tokens", type=int, default=32, help="Tokens repeated between chunks")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed runs")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    with open(args.text, 'r', encoding='utf-8') as f:
+        text = f.read()
+    megabytes = len(text.encode('utf-8')) / 1e6
+    counter = get_token_counter(args.tokenizer)
+
+    best = None
+    for _ in range(max(1, args.repeat)):
+        start_time = time.perf_counter()
+        chunks = list(chunk_blocks(text_blocks(text), counter, args.max_tokens, args.overlap_tokens))
+        elapsed = time.perf_counter() - start_time
+        best = elapsed if best is None else min(best, elapsed)
+
+    sizes = [chunk["tokens"] for chunk in chunks]
+    print(f"{args.text}: {megabytes:.2f} MB, tokenizer {counter.name}")
+    print(f"{len(chunks)} chunks, {sum(sizes) / len(sizes):.0f} tokens on average, {max(sizes)} at most")
+    print(f"Best of {args.repeat}: {best:.3f} seconds, {megabytes / best:.1f} MB/s")
+
+if __name__ == "__main__":
+    main()
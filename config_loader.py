@@ -25,6 +25,10 @@ class ConfigLoader:
         """Get PDF processing configuration."""
         return self.config.get('pdf_processing', {})
 
+    def get_export_config(self) -> Dict[str, Any]:
+        """Get document export configuration."""
+        return self.config.get('export', {})
+
     def get_metadata_config(self) -> Dict[str, Any]:
         """Get metadata extraction configuration."""
         return self.config.get('metadata', {})
@@ -41,6 +45,26 @@ class ConfigLoader:
         """Get processing settings configuration."""
         return self.config.get('processing', {})
 
+    def get_embeddings_config(self) -> Dict[str, Any]:
+        """Get embedding generation configuration."""
+        return self.config.get('embeddings', {})
+
+    def get_retrieval_config(self) -> Dict[str, Any]:
+        """Get retrieval configuration."""
+        return self.config.get('retrieval', {})
+
+    def get_generation_config(self) -> Dict[str, Any]:
+        """Get answer generation configuration."""
+        return self.config.get('generation', {})
+
+    def get_cache_config(self) -> Dict[str, Any]:
+        """Get query cache configuration."""
+        return self.config.get('cache', {})
+
+    def get_server_config(self) -> Dict[str, Any]:
+        """Get RAG server configuration."""
+        return self.config.get('server', {})
+
     def get_quality_config(self) -> Dict[str, Any]:
         """Get quality check configuration."""
         return self.config.get('quality', {})
@@ -0,0 +1,208 @@
+import argparse
+import hashlib
+import json
+import logging
+import os
+import zlib
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from lexical_index import chunks_fingerprint
+
+logger = logging.getLogger(__name__)
+
+# MinHash over word shingles; signatures are split into LSH bands to find candidate pairs
+SHINGLE_SIZE = 5
+NUM_PERMUTATIONS = 64
+NUM_BANDS = 16
+MERSENNE_PRIME = (1 << 61) - 1
+MAX_HASH = (1 << 32) - 1
+MATCHES_VERSION = 1
+
+def normalize_text(text: str) -> str:
+    """Case- and whitespace-insensitive form of a chunk, so trivially different copies hash alike."""
+    return " ".join(text.lower().split())
+
+def content_hash(text: str) -> str:
+    return hashlib.sha1(normalize_text(text).encode('utf-8')).hexdigest()
+
+def shingle_hashes(text: str, size: int = SHINGLE_SIZE) -> np.ndarray:
+    """32-bit hashes of the overlapping word n-grams of ``text``."""
+    words = normalize_text(text).split()
+    if len(words) < size:
+        return np.zeros(0, dtype=np.uint64)
+    shingles = {" ".join(words[i:i + size]) for i in range(len(words) - size + 1)}
+    return np.fromiter((zlib.crc32(shingle.encode('utf-8')) for shingle in shingles),
+                       dtype=np.uint64, count=len(shingles))
+
+class MinHasher:
+    """MinHash signatures using ``(a * x + b) mod p`` permutations of 32-bit shingle hashes."""
+
+    def __init__(self, num_perm: int = NUM_PERMUTATIONS, seed: int = 1):
+        rng = np.random.default_rng(seed)
+        self.a = rng.integers(1, 1 << 31, size=num_perm, dtype=np.uint64)
+        self.b = rng.integers(0, MAX_HASH, size=num_perm, dtype=np.uint64)
+
+    def signature(self, hashes: np.ndarray) -> np.ndarray:
+        # a < 2**31 and x < 2**32, so a * x + b stays within uint64
+        permuted = (hashes[None, :] * self.a[:, None] + self.b[:, None]) % MERSENNE_PRIME
+        return (permuted & MAX_HASH).min(axis=1)
+
+def find_duplicates(texts: List[str], threshold: float = 0.9,
+                    num_perm: int = NUM_PERMUTATIONS, bands: int = NUM_BANDS) -> Tuple[List[int], List[str]]:
+    """Match every text against the earlier texts that are kept.
+
+    Returns, for every text, the index of the kept text it duplicates (its own
+    index if it is kept) and how it matched: "original", "exact" or "near".
+    Exact matches compare hashes of the normalized text. Near matches need a
+    MinHash estimate of shingle Jaccard similarity of at least ``threshold``
+    with the kept text itself, so chains of overlapping chunks are not
+    collapsed into one. A threshold of 1.0 or more turns near matching off.
+    """
+    hasher = MinHasher(num_perm) if threshold < 1.0 else None
+    rows = num_perm // bands
+    representatives = list(range(len(texts)))
+    kinds = ["original"] * len(texts)
+
+    first_by_hash: Dict[str, int] = {}
+    # LSH buckets of kept texts only; a text sharing any band with one is a candidate
+    buckets: Dict[Tuple[int, bytes], List[int]] = {}
+    signatures: Dict[int, np.ndarray] = {}
+
+    for i, text in enumerate(texts):
+        text_hash = content_hash(text)
+        first = first_by_hash.get(text_hash)
+        if first is not None:
+            representatives[i] = representatives[first]
+            kinds[i] = "exact"
+            continue
+        first_by_hash[text_hash] = i
+
+        if hasher is None:
+            continue
+        hashes = shingle_hashes(text)
+        if not len(hashes):
+            continue
+        signature = hasher.signature(hashes)
+        band_keys = [(band, signature[band * rows:(band + 1) * rows].tobytes()) for band in range(bands)]
+
+        candidates = {kept for key in band_keys for kept in buckets.get(key, ())}
+        best = max(candidates, key=lambda kept: np.mean(signatures[kept] == signature), default=None)
+        if best is not None and np.mean(signatures[best] == signature) >= threshold:
+            representatives[i] = best
+            kinds[i] = "near"
+            continue
+
+        signatures[i] = signature
+        for key in band_keys:
+            buckets.setdefault(key, []).append(i)
+
+    return representatives, kinds
+
+def load_or_find_duplicates(chunks: List[Dict[str, Any]], threshold: float, path: Path) -> Tuple[List[int], List[str]]:
+    """``find_duplicates`` for ``chunks``, reusing the matches saved at ``path`` if chunks and threshold are unchanged.
+
+    Only the chunk fingerprint is computed for an unchanged corpus; MinHash
+    runs again, and the result is saved, when anything differs.
+    """
+    path = Path(path)
+    fingerprint = chunks_fingerprint(chunks)
+    if path.exists():
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                saved = json.load(f)
+            if (saved.get("version") == MATCHES_VERSION and saved["fingerprint"] == fingerprint
+                    and saved["threshold"] == threshold):
+                logger.info(f"Loaded duplicate matches from {path}")
+                return saved["representatives"], saved["kinds"]
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable duplicate matches {path}: {str(e)}")
+
+    representatives, kinds = find_duplicates([chunk["content"] for chunk in chunks], threshold)
+    try:
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": MATCHES_VERSION,
+                "fingerprint": fingerprint,
+                "threshold": threshold,
+                "representatives": representatives,
+                "kinds": kinds
+            }, f)
+        os.replace(tmp_path, path)
+    except Exception as e:
+        logger.error(f"Error saving duplicate matches: {str(e)}")
+    return representatives, kinds
+
+def deduplicate(chunks: List[Dict[str, Any]], threshold: float = 0.9,
+                cache_path: Optional[Path] = None) -> Tuple[List[Dict[str, Any]], Dict[str, Any]]:
+    """Collapse duplicate chunks into the first copy of each.
+
+    A kept chunk that stands for others gets a ``duplicates`` list of
+    back-references (document, id, file_path and match kind) to every copy it
+    replaced. With ``cache_path`` the matches are persisted and reused while
+    the chunks are unchanged. Returns the kept chunks, in corpus order, and a
+    savings report.
+    """
+    if cache_path is not None:
+        representatives, kinds = load_or_find_duplicates(chunks, threshold, cache_path)
+    else:
+        representatives, kinds = find_duplicates([chunk["content"] for chunk in chunks], threshold)
+
+    kept: Dict[int, Dict[str, Any]] = {}
+    report = {"chunks": len(chunks), "unique": 0, "exact_duplicates": 0, "near_duplicates": 0, "characters_saved": 0}
+    for i, (chunk, representative, kind) in enumerate(zip(chunks, representatives, kinds)):
+        if representative == i:
+            kept[i] = dict(chunk)
+            continue
+        kept[representative].setdefault("duplicates", []).append({
+            "document": chunk["document"],
+            "id": chunk["id"],
+            "file_path": chunk.get("file_path"),
+            "match": kind
+        })
+        report[f"{kind}_duplicates"] += 1
+        report["characters_saved"] += len(chunk["content"])
+
+    report["unique"] = len(kept)
+    report["removed"] = len(chunks) - len(kept)
+    return list(kept.values()), report
+
+def main():
+    parser = argparse.ArgumentParser(description="Report exact and near-duplicate chunks and the work deduplication saves")
+    parser.add_argument("--chunks_dir", type=str, default="processed_redbooks/chunks",
+                        help="Directory containing chunk shards or chunk files")
+    parser.add_argument("--threshold", type=float, default=0.9,
+                        help="Estimated Jaccard similarity for near duplicates (1.0 = exact only)")
+    parser.add_argument("--dim", type=int, default=4096,
+                        help="Embedding dimensions, for the vector store size estimate")
+    parser.add_argument("--top", type=int, default=10, help="Number of most repeated chunks to list")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from chunk_store import load_chunks
+    from lexical_index import tokenize
+    chunks = load_chunks(Path(args.chunks_dir))
+    unique, report = deduplicate(chunks, args.threshold)
+
+    removed_keys = {(ref["document"], ref["id"]) for chunk in unique for ref in chunk.get("duplicates", [])}
+    postings_saved = sum(len(set(tokenize(chunk["content"]))) for chunk in chunks
+                         if (chunk["document"], chunk["id"]) in removed_keys)
+
+    print(f"Chunks: {report['chunks']}, unique: {report['unique']} "
+          f"({report['exact_duplicates']} exact and {report['near_duplicates']} near duplicates removed)")
+    print(f"Embedding calls saved: {report['removed']} ({report['characters_saved'] / 1e6:.2f} M characters)")
+    print(f"Vector store saved: {report['removed'] * args.dim * 4 / 1e6:.1f} MB at {args.dim} float32 dimensions")
+    print(f"BM25 postings saved: {postings_saved}")
+
+    repeated = sorted((chunk for chunk in unique if chunk.get("duplicates")),
+                      key=lambda chunk: len(chunk["duplicates"]), reverse=True)[:args.top]
+    for chunk in repeated:
+        preview = " ".join(chunk["content"].split())[:70]
+        print(f"  {len(chunk['duplicates']) + 1:>4} copies: {preview}")
+
+if __name__ == "__main__":
+    main()
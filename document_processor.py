@@ -1,14 +1,15 @@
 import logging
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import Dict, Any
 import json
-import fitz
 from concurrent.futures import ThreadPoolExecutor
 import hashlib
-from datetime import datetime
 
+from chunking import stream_chunks
+from chunk_store import ChunkShardWriter, shard_path
 from config_loader import ConfigLoader
 from metadata_extractor import MetadataExtractor
+from pdf_pages import PdfPages
 
 logger = logging.getLogger(__name__)
 
@@ -61,23 +62,25 @@ class DocumentProcessor:
                 logger.info(f"Skipping already processed file: {pdf_path}")
                 return
 
-            # Extract metadata
-            metadata = self.metadata_extractor.extract_metadata(pdf_path)
-            if not metadata:
-                logger.error(f"Failed to extract metadata from {pdf_path}")
-                return
+            # Open the PDF once; metadata and content share its decoded pages
+            with PdfPages(pdf_path) as pages:
+                # Extract metadata
+                metadata = self.metadata_extractor.extract_metadata(pdf_path, pages)
+                if not metadata:
+                    logger.error(f"Failed to extract metadata from {pdf_path}")
+                    return
 
-            # Create document directory
-            doc_dir = self.config_loader.get_path('processed_dir') / pdf_path.stem
-            doc_dir.mkdir(exist_ok=True)
+                # Create document directory
+                doc_dir = self.config_loader.get_path('processed_dir') / pdf_path.stem
+                doc_dir.mkdir(exist_ok=True)
 
-            # Save metadata
-            metadata_file = doc_dir / "metadata.json"
-            with open(metadata_file, 'w') as f:
-                json.dump(metadata, f, indent=2)
+                # Save metadata
+                metadata_file = doc_dir / "metadata.json"
+                with open(metadata_file, 'w') as f:
+                    json.dump(metadata, f, indent=2)
 
-            # Process document content
-            self._process_content(pdf_path, doc_dir, metadata)
+                # Process document content
+                self._process_content(pages, doc_dir)
 
             # Mark as processed
             self.processed_files.add(pdf_path.name)
@@ -86,61 +89,36 @@ class DocumentProcessor:
         except Exception as e:
             logger.error(f"Error processing {pdf_path}: {e}")
 
-    def _process_content(self, pdf_path: Path, doc_dir: Path, metadata: Dict[str, Any]) -> None:
+    def _process_content(self, pages: PdfPages, doc_dir: Path) -> None:
         """Process document content into chunks."""
-        doc = fitz.open(pdf_path)
-        chunks_dir = doc_dir / "chunks"
-        chunks_dir.mkdir(exist_ok=True)
-
         pdf_config = self.config['pdf_processing']
         chunk_size = pdf_config['chunk_size']
         chunk_overlap = pdf_config['chunk_overlap']
         min_chunk_size = pdf_config['min_chunk_size']
         max_chunk_size = pdf_config['max_chunk_size']
 
-        current_chunk = []
-        current_size = 0
-        chunk_number = 0
-
-        for page_num in range(len(doc)):
-            page = doc[page_num]
-            text = page.get_text()
-            words = text.split()
-
-            for word in words:
-                word_size = len(word) + 1  # +1 for space
-                if current_size + word_size > chunk_size:
-                    if current_size >= min_chunk_size:
-                        self._save_chunk(chunks_dir, chunk_number, current_chunk, metadata)
-                        chunk_number += 1
-                    current_chunk = [word]
-                    current_size = word_size
-                else:
-                    current_chunk.append(word)
-                    current_size += word_size
-
-        # Save the last chunk if it meets minimum size
-        if current_size >= min_chunk_size:
-            self._save_chunk(chunks_dir, chunk_number, current_chunk, metadata)
-
-        doc.close()
-
-    def _save_chunk(self, chunks_dir: Path, chunk_number: int, words: List[str], metadata: Dict[str, Any]) -> None:
-        """Save a chunk of text with its metadata."""
-        content = ' '.join(words)
+        # Chunks stream straight into one shard; it only replaces the previous one once complete
+        chunks = stream_chunks(pages.iter_pages(), chunk_size, chunk_overlap, min_chunk_size, max_chunk_size)
+        with ChunkShardWriter(shard_path(doc_dir, pages.path.stem)) as writer:
+            for chunk_number, chunk in enumerate(chunks):
+                self._save_chunk(writer, chunk_number, chunk)
+
+    def _save_chunk(self, writer: ChunkShardWriter, chunk_number: int, chunk: Dict[str, Any]) -> None:
+        """Append a chunk of text with its chunk-local metadata to the document's shard.
+
+        Document metadata is only in metadata.json; see chunk_store.chunk_metadata.
+        """
         chunk_data = {
-            "content": content,
+            "id": f"chunk_{chunk_number:04d}",
+            "content": chunk["text"],
             "metadata": {
-                **metadata,
                 "chunk_number": chunk_number,
-                "word_count": len(words),
-                "processed_date": datetime.now().isoformat()
+                "word_count": chunk["word_count"],
+                "page_start": chunk["page_start"],
+                "page_end": chunk["page_end"]
             }
         }
-
-        chunk_file = chunks_dir / f"chunk_{chunk_number:04d}.json"
-        with open(chunk_file, 'w') as f:
-            json.dump(chunk_data, f, indent=2)
+        writer.write(chunk_data)
 
     def _should_skip_file(self, pdf_path: Path) -> bool:
         """Check if a file should be skipped based on incremental processing settings."""
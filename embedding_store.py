@@ -0,0 +1,337 @@
+import hashlib
+import json
+import logging
+import os
+import time
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Callable, Sequence, Tuple
+
+import numpy as np
+
+from ann_index import IVFIndex
+
+logger = logging.getLogger(__name__)
+
+def content_key(model: str, content: str) -> str:
+    """Content address of a chunk's embedding: a hash of the model name and the chunk text."""
+    hasher = hashlib.sha256()
+    hasher.update(model.encode('utf-8'))
+    hasher.update(b"\0")
+    hasher.update(content.encode('utf-8'))
+    return hasher.hexdigest()
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scale each row to unit length so cosine similarity becomes a dot product."""
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    return (matrix / np.maximum(norms, 1e-12)).astype(np.float32, copy=False)
+
+class EmbeddingStore:
+    """Columnar on-disk embedding store.
+
+    Vectors live in a float32 ``.npy`` matrix that is memory-mapped on load,
+    and chunk ids, documents, file paths and content keys live in a small JSON
+    sidecar with one entry per matrix row. Rows are stored L2-normalized so a
+    query is scored against the whole corpus with one matrix-vector product.
+
+    Every save writes the matrix under a new generation file name recorded in
+    the sidecar, so a store that another instance still has memory-mapped (the
+    RAG server's previous instance during a reload) is never replaced in place,
+    which Windows refuses. Older generations are deleted once nothing maps them.
+
+    With ``ann_config`` enabled, an IVF index is built next to the matrix on
+    save for stores of at least ``min_vectors`` rows, and loaded on first search.
+    """
+
+    def __init__(self, store_dir: Path, model: str, ann_config: Optional[Dict[str, Any]] = None):
+        self.store_dir = Path(store_dir)
+        self.model = model
+        slug = model.replace(':', '_').replace('/', '_')
+        self.slug = slug
+        # Stores written before generation file names use this name; load() switches to the sidecar's
+        self.matrix_file = self.store_dir / f"embeddings_{slug}.npy"
+        self.index_file = self.store_dir / f"embeddings_{slug}.index.json"
+        self.legacy_cache_file = self.store_dir / f"embeddings_cache_{model.replace(':', '_')}.json"
+        self.ann_file = self.store_dir / f"embeddings_{slug}.ivf.npz"
+        self.ann_config = ann_config or {}
+        self.generation = ""
+        self._ann: Optional[IVFIndex] = None
+        self._ann_loaded = False
+        self.matrix: Optional[np.ndarray] = None
+        self.ids: List[str] = []
+        self.documents: List[str] = []
+        self.file_paths: List[str] = []
+        self.keys: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return 0 if self.matrix is None else int(self.matrix.shape[1])
+
+    def exists(self) -> bool:
+        return self.index_file.exists()
+
+    def _generation_file(self, generation: str) -> Path:
+        return self.store_dir / f"embeddings_{self.slug}.{generation}.npy"
+
+    def _remove_stale_generations(self) -> None:
+        """Delete matrix files of older generations, skipping any still mapped (Windows refuses)."""
+        stale = list(self.store_dir.glob(f"embeddings_{self.slug}.*.npy")) + [self.store_dir / f"embeddings_{self.slug}.npy"]
+        for path in stale:
+            if path == self.matrix_file or not path.exists():
+                continue
+            try:
+                path.unlink()
+            except OSError as e:
+                logger.info(f"Keeping {path} for now, it is still in use: {str(e)}")
+
+    def load(self) -> bool:
+        """Memory-map the matrix and read the sidecar index. Returns False if no usable store exists."""
+        if not self.exists():
+            return self._migrate_legacy_cache()
+
+        try:
+            with open(self.index_file, 'r', encoding='utf-8') as f:
+                index = json.load(f)
+
+            if index.get("model") != self.model:
+                logger.warning(f"Embedding store {self.index_file} belongs to model {index.get('model')}, ignoring")
+                return False
+
+            matrix_file = self.store_dir / index["matrix"] if index.get("matrix") else self.matrix_file
+            matrix = np.load(matrix_file, mmap_mode='r')
+            if matrix.shape[0] != len(index["ids"]):
+                logger.warning("Embedding store matrix and index disagree on row count, ignoring")
+                return False
+
+            if not index.get("normalized"):
+                # Older stores hold raw vectors; normalize a copy in memory
+                logger.info("Embedding store is not normalized, normalizing in memory")
+                matrix = normalize_rows(np.asarray(matrix, dtype=np.float32))
+
+            self.matrix = matrix
+            self.matrix_file = matrix_file
+            self.ids = index["ids"]
+            self.documents = index["documents"]
+            self.file_paths = index["file_paths"]
+            # Stores written before content addressing have no keys
+            self.keys = index.get("keys") or [""] * len(self.ids)
+            self.generation = index.get("generation", "")
+            self._ann = None
+            self._ann_loaded = False
+            logger.info(f"Memory-mapped {len(self.ids)} embeddings ({self.dim} dims) from {self.matrix_file}")
+            return True
+        except Exception as e:
+            logger.error(f"Error loading embedding store: {str(e)}")
+            return False
+
+    def save(self, vectors, ids: List[str], documents: List[str], file_paths: List[str],
+             keys: Optional[List[str]] = None) -> None:
+        """Write a new matrix generation and sidecar index, switching to them atomically."""
+        matrix = np.asarray(vectors, dtype=np.float32)
+        keys = list(keys) if keys is not None else [""] * len(ids)
+        if matrix.ndim != 2:
+            matrix = matrix.reshape(len(ids), -1)
+        matrix = normalize_rows(matrix)
+
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+        # Write to temporary files first so a crash never leaves a half-written store
+        generation = uuid.uuid4().hex
+        matrix_file = self._generation_file(generation)
+        tmp_matrix = matrix_file.with_suffix(".npy.tmp")
+        tmp_index = self.index_file.with_suffix(".json.tmp")
+        with open(tmp_matrix, 'wb') as f:
+            np.save(f, matrix)
+        with open(tmp_index, 'w', encoding='utf-8') as f:
+            json.dump({
+                "model": self.model,
+                "date_generated": time.strftime("%Y-%m-%d %H:%M:%S"),
+                "count": len(ids),
+                "dim": int(matrix.shape[1]) if len(ids) else 0,
+                "normalized": True,
+                "generation": generation,
+                "matrix": matrix_file.name,
+                "ids": ids,
+                "documents": documents,
+                "file_paths": file_paths,
+                "keys": keys
+            }, f, ensure_ascii=False)
+        # The sidecar switches readers to the new generation; the old matrix file is never overwritten
+        self.matrix = None
+        os.replace(tmp_matrix, matrix_file)
+        os.replace(tmp_index, self.index_file)
+        self.matrix_file = matrix_file
+        self._remove_stale_generations()
+
+        self.ids = list(ids)
+        self.documents = list(documents)
+        self.file_paths = list(file_paths)
+        self.keys = keys
+        self.generation = generation
+        self.matrix = np.load(self.matrix_file, mmap_mode='r')
+        logger.info(f"Saved {len(ids)} embeddings to {self.matrix_file}")
+
+        self._ann = None
+        self._ann_loaded = False
+        if self._ann_wanted():
+            self._build_ann()
+        elif self.ann_file.exists():
+            self.ann_file.unlink()
+
+    def _ann_wanted(self) -> bool:
+        return bool(self.ann_config.get('enabled')) and len(self) >= self.ann_config.get('min_vectors', 0) and len(self) > 0
+
+    def _build_ann(self) -> None:
+        self._ann = IVFIndex.build(self.matrix, n_lists=self.ann_config.get('n_lists', 0), generation=self.generation)
+        self._ann.save(self.ann_file)
+        self._ann_loaded = True
+
+    @property
+    def ann(self) -> Optional[IVFIndex]:
+        """The IVF index for this store, loaded from disk on first use.
+
+        A missing or stale index is rebuilt, so enabling ANN on an existing
+        store takes effect without re-embedding.
+        """
+        if not self._ann_loaded:
+            self._ann_loaded = True
+            if self._ann_wanted():
+                index = IVFIndex.load(self.ann_file) if self.ann_file.exists() else None
+                if index is not None and index.generation == self.generation:
+                    self._ann = index
+                    logger.info(f"Loaded IVF index with {index.n_lists} lists from {self.ann_file}")
+                else:
+                    logger.info("IVF index is missing or stale for this embedding store, rebuilding it")
+                    self._build_ann()
+        return self._ann
+
+    def update(self, chunks: Sequence[Dict[str, Any]],
+               embed_fn: Callable[[List[str]], List[Optional[Sequence[float]]]]) -> Dict[str, int]:
+        """Bring the store in line with ``chunks``, embedding only new or changed content.
+
+        ``embed_fn`` receives the texts that have no vector yet and returns one
+        vector (or None on failure) per text. Rows for chunks that no longer
+        exist are dropped when the store is rewritten.
+        """
+        keys = [content_key(self.model, chunk["content"]) for chunk in chunks]
+
+        existing = {}
+        legacy = {}
+        for i, key in enumerate(self.keys):
+            if key:
+                existing.setdefault(key, i)
+            else:
+                legacy[(self.documents[i], self.ids[i])] = i
+
+        source_rows = []
+        missing = {}
+        for chunk, key in zip(chunks, keys):
+            row = existing.get(key)
+            if row is None:
+                row = legacy.get((chunk["document"], chunk["id"]))
+            source_rows.append(row)
+            if row is None and key not in missing:
+                missing[key] = chunk["content"]
+
+        reused_rows = {row for row in source_rows if row is not None}
+        stats = {
+            "reused": sum(1 for row in source_rows if row is not None),
+            "embedded": 0,
+            "failed": 0,
+            "removed": len(self) - len(reused_rows)
+        }
+
+        # Nothing new, nothing removed and rows already in chunk order: leave the files alone
+        if (not missing and keys == self.keys and source_rows == list(range(len(self)))):
+            logger.info("Embedding store is up to date, no embedding calls needed")
+            return stats
+
+        new_vectors = {}
+        if missing:
+            logger.info(f"Embedding {len(missing)} new or changed chunks ({stats['reused']} reused)")
+            for key, vector in zip(missing.keys(), embed_fn(list(missing.values()))):
+                if vector is not None:
+                    new_vectors[key] = np.asarray(vector, dtype=np.float32)
+            stats["embedded"] = len(new_vectors)
+
+        dim = self.dim or next((len(v) for v in new_vectors.values()), 0)
+        vectors = []
+        ids, documents, file_paths, row_keys = [], [], [], []
+        for chunk, key, row in zip(chunks, keys, source_rows):
+            if row is not None:
+                vector = self.matrix[row]
+            elif key in new_vectors:
+                vector = new_vectors[key]
+            else:
+                stats["failed"] += 1
+                continue
+            vectors.append(vector)
+            ids.append(chunk["id"])
+            documents.append(chunk["document"])
+            file_paths.append(chunk["file_path"])
+            row_keys.append(key)
+
+        matrix = np.vstack(vectors) if vectors else np.zeros((0, dim), dtype=np.float32)
+        # Drop views into the old memory map so its file can be deleted (required on Windows)
+        vectors = vector = None
+        self.save(matrix, ids, documents, file_paths, row_keys)
+
+        if stats["removed"]:
+            logger.info(f"Removed {stats['removed']} embeddings for deleted or changed chunks")
+        if stats["failed"]:
+            logger.warning(f"{stats['failed']} chunks could not be embedded and will be retried next run")
+        return stats
+
+    def search(self, query_vector: Sequence[float], k: int = 5) -> List[Tuple[int, float]]:
+        """Return the ``k`` rows most similar to ``query_vector`` as (row, cosine similarity) pairs."""
+        if self.matrix is None or len(self) == 0:
+            return []
+
+        query = normalize_rows(np.asarray(query_vector, dtype=np.float32))
+        if self.ann is not None:
+            return self.ann.search(self.matrix, query, k, self.ann_config.get('nprobe', 16))
+
+        scores = self.matrix @ query
+
+        k = min(k, len(scores))
+        if k < len(scores):
+            top = np.argpartition(-scores, k - 1)[:k]
+        else:
+            top = np.arange(len(scores))
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def row(self, i: int) -> Dict[str, Any]:
+        """Return the metadata for one row of the matrix."""
+        return {
+            "id": self.ids[i],
+            "document": self.documents[i],
+            "file_path": self.file_paths[i]
+        }
+
+    def _migrate_legacy_cache(self) -> bool:
+        """Convert an old ``embeddings_cache_<model>.json`` file into the binary store."""
+        if not self.legacy_cache_file.exists():
+            return False
+
+        try:
+            with open(self.legacy_cache_file, 'r', encoding='utf-8') as f:
+                cache_data = json.load(f)
+            if cache_data.get("model") != self.model or not cache_data.get("embeddings"):
+                return False
+
+            logger.info(f"Migrating legacy JSON embeddings cache {self.legacy_cache_file}")
+            items = cache_data["embeddings"]
+            self.save(
+                [item["embedding"] for item in items],
+                [item["id"] for item in items],
+                [item["document"] for item in items],
+                [item["file_path"] for item in items]
+            )
+            return True
+        except Exception as e:
+            logger.error(f"Error migrating legacy embeddings cache: {str(e)}")
+            return False
@@ -0,0 +1,83 @@
+import asyncio
+import inspect
+import logging
+from typing import List, Dict, Any, Optional, Callable, Hashable, Tuple
+
+logger = logging.getLogger(__name__)
+
+# A retriever maps (query, number of results) to ranked (key, score) pairs
+Retriever = Callable[[str, int], List[Tuple[Hashable, float]]]
+
+def reciprocal_rank_fusion(rankings: Dict[str, List[Tuple[Hashable, float]]],
+                           weights: Optional[Dict[str, float]] = None,
+                           k: int = 60) -> List[Dict[str, Any]]:
+    """Merge ranked result lists with weighted reciprocal-rank fusion.
+
+    Each key scores ``sum(weight / (k + rank))`` over the lists it appears in,
+    so results found by several retrievers rise to the top without having to
+    calibrate BM25 scores against cosine similarities.
+    """
+    weights = weights or {}
+    fused: Dict[Hashable, Dict[str, Any]] = {}
+
+    for name, ranking in rankings.items():
+        weight = weights.get(name, 1.0)
+        for rank, (key, score) in enumerate(ranking, start=1):
+            entry = fused.setdefault(key, {"key": key, "score": 0.0, "ranks": {}, "scores": {}})
+            entry["score"] += weight / (k + rank)
+            entry["ranks"][name] = rank
+            entry["scores"][name] = score
+
+    return sorted(fused.values(), key=lambda entry: entry["score"], reverse=True)
+
+class HybridRetriever:
+    """Run several retrievers for one query and fuse their rankings.
+
+    Every retriever is asked for ``candidates`` results, which are then merged
+    with reciprocal-rank fusion and cut down to the requested top-k.
+    """
+
+    def __init__(self, retrievers: Dict[str, Retriever], weights: Optional[Dict[str, float]] = None,
+                 rrf_k: int = 60, candidates: int = 20):
+        self.retrievers = retrievers
+        self.weights = weights or {}
+        self.rrf_k = rrf_k
+        self.candidates = candidates
+
+    @classmethod
+    def from_config(cls, retrievers: Dict[str, Retriever], config: Dict[str, Any]) -> "HybridRetriever":
+        """Build a retriever from the ``retrieval.hybrid`` section of config.yaml."""
+        hybrid_config = config.get('retrieval', {}).get('hybrid', {})
+        return cls(
+            retrievers,
+            weights={
+                "lexical": hybrid_config.get('lexical_weight', 1.0),
+                "vector": hybrid_config.get('vector_weight', 1.0)
+            },
+            rrf_k=hybrid_config.get('rrf_k', 60),
+            candidates=hybrid_config.get('candidates', 20)
+        )
+
+    async def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        """Return the fused top results as dicts with key, score, ranks and per-retriever scores.
+
+        All retrievers run at once: coroutine retrievers are awaited on the
+        event loop, and plain ones run in a worker thread. The vector
+        retriever's query embedding round-trip then overlaps with the BM25 lookup.
+        """
+        names = list(self.retrievers)
+        candidates = max(self.candidates, num_results)
+        calls = [retriever(query, candidates) if inspect.iscoroutinefunction(retriever)
+                 else asyncio.to_thread(retriever, query, candidates)
+                 for retriever in self.retrievers.values()]
+
+        rankings = {}
+        for name, ranking in zip(names, await asyncio.gather(*calls, return_exceptions=True)):
+            if isinstance(ranking, BaseException):
+                if isinstance(ranking, asyncio.CancelledError):
+                    raise ranking
+                logger.error(f"Error in {name} retrieval: {str(ranking)}")
+                ranking = []
+            rankings[name] = ranking
+
+        return reciprocal_rank_fusion(rankings, self.weights, self.rrf_k)[:num_results]
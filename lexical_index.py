@@ -0,0 +1,155 @@
+import hashlib
+import json
+import logging
+import math
+import os
+import re
+from collections import Counter
+from pathlib import Path
+from typing import List, Dict, Any, Optional, Tuple
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r'\b\w+\b')
+INDEX_VERSION = 1
+
+def tokenize(text: str) -> List[str]:
+    """Lowercase word tokens, matching the terms highlighted by simple_query."""
+    return TOKEN_PATTERN.findall(text.lower())
+
+def chunks_fingerprint(chunks: List[Dict[str, Any]]) -> str:
+    """Hash of chunk identities and contents, used to detect a stale index."""
+    hasher = hashlib.sha1()
+    for chunk in chunks:
+        hasher.update(f"{chunk['document']}/{chunk['id']}\0".encode('utf-8'))
+        hasher.update(chunk["content"].encode('utf-8'))
+    return hasher.hexdigest()
+
+class BM25Index:
+    """Inverted index with BM25 scoring.
+
+    Each term maps to a postings list of chunk positions and term frequencies.
+    A query only touches the postings of its own terms.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75):
+        self.k1 = k1
+        self.b = b
+        self.fingerprint = ""
+        self.doc_lengths = np.zeros(0, dtype=np.float32)
+        self.postings: Dict[str, Tuple[np.ndarray, np.ndarray]] = {}
+        self._length_norm = np.zeros(0, dtype=np.float32)
+
+    def __len__(self) -> int:
+        return len(self.doc_lengths)
+
+    @classmethod
+    def build(cls, chunks: List[Dict[str, Any]], k1: float = 1.5, b: float = 0.75) -> "BM25Index":
+        """Tokenize every chunk once and build the postings lists."""
+        index = cls(k1, b)
+        postings: Dict[str, Tuple[List[int], List[int]]] = {}
+        doc_lengths = []
+
+        for position, chunk in enumerate(chunks):
+            counts = Counter(tokenize(chunk["content"]))
+            doc_lengths.append(sum(counts.values()))
+            for term, tf in counts.items():
+                docs, tfs = postings.setdefault(term, ([], []))
+                docs.append(position)
+                tfs.append(tf)
+
+        index.fingerprint = chunks_fingerprint(chunks)
+        index.doc_lengths = np.asarray(doc_lengths, dtype=np.float32)
+        index.postings = {term: (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+                          for term, (docs, tfs) in postings.items()}
+        index._prepare()
+        logger.info(f"Built BM25 index over {len(chunks)} chunks with {len(index.postings)} terms")
+        return index
+
+    def _prepare(self) -> None:
+        """Precompute the per-chunk length normalization used in every query."""
+        avgdl = float(self.doc_lengths.mean()) if len(self.doc_lengths) else 0.0
+        if avgdl > 0:
+            self._length_norm = self.k1 * (1 - self.b + self.b * self.doc_lengths / avgdl)
+        else:
+            self._length_norm = np.full(len(self.doc_lengths), self.k1, dtype=np.float32)
+
+    def search(self, query: str, num_results: int = 5) -> List[Tuple[int, float]]:
+        """Return up to ``num_results`` (chunk position, BM25 score) pairs, best first."""
+        terms = set(tokenize(query))
+        n = len(self.doc_lengths)
+        if not terms or n == 0:
+            return []
+
+        scores = np.zeros(n, dtype=np.float32)
+        for term in terms:
+            posting = self.postings.get(term)
+            if posting is None:
+                continue
+            docs, tfs = posting
+            idf = math.log(1 + (n - len(docs) + 0.5) / (len(docs) + 0.5))
+            scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + self._length_norm[docs])
+
+        matched = np.flatnonzero(scores)
+        if len(matched) == 0:
+            return []
+        k = min(num_results, len(matched))
+        top = matched[np.argpartition(-scores[matched], k - 1)[:k]] if k < len(matched) else matched
+        top = top[np.argsort(-scores[top])]
+        return [(int(i), float(scores[i])) for i in top]
+
+    def save(self, path: Path) -> None:
+        """Persist the index as JSON, replacing any existing file atomically."""
+        path = Path(path)
+        tmp_path = path.with_suffix(path.suffix + ".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({
+                "version": INDEX_VERSION,
+                "fingerprint": self.fingerprint,
+                "k1": self.k1,
+                "b": self.b,
+                "doc_lengths": self.doc_lengths.astype(int).tolist(),
+                "postings": {term: [docs.tolist(), tfs.astype(int).tolist()]
+                             for term, (docs, tfs) in self.postings.items()}
+            }, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        logger.info(f"Saved BM25 index to {path}")
+
+    @classmethod
+    def load(cls, path: Path) -> Optional["BM25Index"]:
+        """Load a persisted index, or return None if it is missing or unreadable."""
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            if data.get("version") != INDEX_VERSION:
+                return None
+            index = cls(data["k1"], data["b"])
+            index.fingerprint = data["fingerprint"]
+            index.doc_lengths = np.asarray(data["doc_lengths"], dtype=np.float32)
+            index.postings = {term: (np.asarray(docs, dtype=np.int32), np.asarray(tfs, dtype=np.float32))
+                              for term, (docs, tfs) in data["postings"].items()}
+            index._prepare()
+            return index
+        except Exception as e:
+            logger.error(f"Error loading BM25 index from {path}: {str(e)}")
+            return None
+
+    @classmethod
+    def load_or_build(cls, chunks: List[Dict[str, Any]], path: Path) -> "BM25Index":
+        """Reuse the persisted index if it matches ``chunks``, otherwise rebuild and save it."""
+        index = cls.load(path)
+        if index is not None and index.fingerprint == chunks_fingerprint(chunks):
+            logger.info(f"Loaded BM25 index from {path}")
+            return index
+
+        index = cls.build(chunks)
+        try:
+            index.save(path)
+        except Exception as e:
+            logger.error(f"Error saving BM25 index: {str(e)}")
+        return index
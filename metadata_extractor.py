@@ -1,21 +1,26 @@
-import fitz  # PyMuPDF
 from pathlib import Path
 from typing import Dict, Any, Optional
 import logging
 from datetime import datetime
 import re
 
+from pdf_pages import PdfPages
+
 logger = logging.getLogger(__name__)
 
 class MetadataExtractor:
     def __init__(self, config: Dict[str, Any]):
         self.config = config
 
-    def extract_metadata(self, pdf_path: Path) -> Dict[str, Any]:
-        """Extract metadata from a PDF file."""
+    def extract_metadata(self, pdf_path: Path, pages: Optional[PdfPages] = None) -> Dict[str, Any]:
+        """Extract metadata from a PDF file.
+
+        Pass ``pages`` to reuse an already open PDF and its decoded page text.
+        """
+        doc = None
         try:
-            doc = fitz.open(pdf_path)
-            metadata = {
+            doc = pages if pages is not None else PdfPages(pdf_path)
+            return {
                 "title": self._extract_title(doc),
                 "author": self._extract_author(doc),
                 "date": self._extract_date(doc),
@@ -26,13 +31,15 @@ class MetadataExtractor:
                 "page_count": len(doc),
                 "processed_date": datetime.now().isoformat()
             }
-            doc.close()
-            return metadata
         except Exception as e:
             logger.error(f"Error extracting metadata from {pdf_path}: {e}")
             return {}
+        finally:
+            # Only close a handle opened here; a shared one belongs to the caller
+            if pages is None and doc is not None:
+                doc.close()
 
-    def _extract_title(self, doc: fitz.Document) -> Optional[str]:
+    def _extract_title(self, doc: PdfPages) -> Optional[str]:
         """Extract title from PDF metadata or first page."""
         if self.config.get('extract_title', True):
             # Try to get from PDF metadata first
@@ -42,8 +49,7 @@ class MetadataExtractor:
 
             # Fallback to first page content
             if len(doc) > 0:
-                first_page = doc[0]
-                text = first_page.get_text()
+                text = doc.text(0)
                 # Look for title-like text (usually first few lines)
                 lines = text.split('\n')[:3]
                 for line in lines:
@@ -51,13 +57,13 @@ class MetadataExtractor:
                         return line.strip()
         return None
 
-    def _extract_author(self, doc: fitz.Document) -> Optional[str]:
+    def _extract_author(self, doc: PdfPages) -> Optional[str]:
         """Extract author from PDF metadata."""
         if self.config.get('extract_author', True):
             return doc.metadata.get('author')
         return None
 
-    def _extract_date(self, doc: fitz.Document) -> Optional[str]:
+    def _extract_date(self, doc: PdfPages) -> Optional[str]:
         """Extract date from PDF metadata or content."""
         if self.config.get('extract_date', True):
             # Try to get from PDF metadata first
@@ -67,7 +73,7 @@ class MetadataExtractor:
 
             # Fallback to content search
             if len(doc) > 0:
-                text = doc[0].get_text()
+                text = doc.text(0)
                 # Look for date patterns
                 date_patterns = [
                     r'\d{4}-\d{2}-\d{2}',
@@ -80,13 +86,13 @@ class MetadataExtractor:
                         return matches[0]
         return None
 
-    def _extract_abstract(self, doc: fitz.Document) -> Optional[str]:
+    def _extract_abstract(self, doc: PdfPages) -> Optional[str]:
         """Extract abstract from first few pages."""
         if self.config.get('extract_abstract', True):
             abstract = []
             # Look in first 3 pages for abstract
             for page_num in range(min(3, len(doc))):
-                text = doc[page_num].get_text()
+                text = doc.text(page_num)
                 # Look for abstract section
                 if "abstract" in text.lower():
                     lines = text.split('\n')
@@ -102,7 +108,7 @@ class MetadataExtractor:
             return ' '.join(abstract) if abstract else None
         return None
 
-    def _extract_keywords(self, doc: fitz.Document) -> Optional[list]:
+    def _extract_keywords(self, doc: PdfPages) -> Optional[list]:
         """Extract keywords from PDF metadata or content."""
         if self.config.get('extract_keywords', True):
             # Try to get from PDF metadata first
@@ -112,7 +118,7 @@ class MetadataExtractor:
 
             # Fallback to content search
             if len(doc) > 0:
-                text = doc[0].get_text()
+                text = doc.text(0)
                 # Look for keywords section
                 if "keywords" in text.lower():
                     lines = text.split('\n')
@@ -1,16 +1,28 @@
 import argparse
+import asyncio
+import hashlib
 import json
 import logging
 import os
 import re
-import requests
-import time
+import shutil
+import signal
 from pathlib import Path
-from typing import List, Dict, Any
-import numpy as np
+from typing import List, Dict, Any, Awaitable, Callable, Optional, Tuple
+import httpx
 from tqdm import tqdm
 from colorama import init, Fore, Style
 
+from chunk_store import iter_chunks
+from chunk_quality import filter_chunks
+from config_loader import ConfigLoader
+from dedup import deduplicate
+from embedding_store import EmbeddingStore
+from hybrid_search import HybridRetriever
+from lexical_index import BM25Index
+from ollama_client import AsyncOllamaClient
+from query_cache import LRUCache, VectorCache, cache_key, normalize_query
+
 # Initialize colorama for colored terminal output
 init()
 
@@ -22,13 +34,24 @@ logger = logging.getLogger(__name__)
 OLLAMA_BASE_URL = "http://localhost:11434/api"
 DEFAULT_MODEL = "granite3.2:8b-instruct-fp16"
 
+# Bump when the JSONL entry layout changes, so prepare_for_ollama rewrites every file
+PREPARE_STATE_VERSION = 1
+
 class OllamaRAG:
-    def __init__(self, chunks_dir: str, ollama_dir: str, model: str = DEFAULT_MODEL):
+    def __init__(self, chunks_dir: str, ollama_dir: str, model: str = DEFAULT_MODEL, config: Dict[str, Any] = None,
+                 async_client: Optional[AsyncOllamaClient] = None,
+                 caches: Optional[Tuple[VectorCache, LRUCache]] = None):
         self.chunks_dir = Path(chunks_dir)
         self.ollama_dir = Path(ollama_dir)
         self.model = model
+        self.config = config or {}
+        # Shared by every coroutine path (interactive session and RAG server); may be shared across reloads.
+        # It is bound to the event loop that first uses it, so synchronous setup uses _run_detached instead
+        self.async_client = async_client or AsyncOllamaClient.from_config(model, self.config, OLLAMA_BASE_URL)
         self.chunks = []
-        self.embeddings = []
+        self.chunk_index = {}
+        self.lexical_index = None
+        self.embeddings = EmbeddingStore(self.ollama_dir, model, self.config.get('retrieval', {}).get('ann'))
         self.documents = set()
         
         # System prompt for technical content
@@ -47,35 +70,68 @@ When responding to queries:
 - Cite specific IBM Redbooks or documentation when possible from the context
 
 Your goal is to provide technically precise assistance with IBM technologies."""
+        self.system_prompt_hash = hashlib.sha256(self.system_prompt.encode('utf-8')).hexdigest()
+        
+        # Caches for repeated questions within and across interactive sessions; the RAG server
+        # passes the same caches to every reloaded instance
+        self.query_embedding_cache, self.answer_cache = caches or self.build_caches(self.ollama_dir, model, self.config)
+    
+    @staticmethod
+    def build_caches(ollama_dir: Path, model: str, config: Dict[str, Any]) -> Tuple[VectorCache, LRUCache]:
+        """Query embedding and answer caches from the ``cache`` section of config.yaml."""
+        cache_config = config.get('cache', {})
+        query_embedding_cache = VectorCache.from_config(
+            cache_config.get('query_embeddings', {'max_size': 1024}),
+            Path(ollama_dir) / f"query_embedding_cache_{model.replace(':', '_')}.npy"
+        )
+        answer_cache = LRUCache.from_config(
+            cache_config.get('answers', {'max_size': 256}),
+            Path(ollama_dir) / f"answer_cache_{model.replace(':', '_')}.json"
+        )
+        return query_embedding_cache, answer_cache
+    
+    def _run_detached(self, call: Callable[[AsyncOllamaClient], Awaitable[Any]]) -> Any:
+        """Run ``call`` on a short-lived async client in its own event loop, for synchronous setup steps."""
+        async def run():
+            client = AsyncOllamaClient.from_config(self.model, self.config, OLLAMA_BASE_URL)
+            try:
+                return await call(client)
+            finally:
+                await client.aclose()
+        return asyncio.run(run())
     
     def check_ollama_available(self) -> bool:
         """Check if Ollama server is running."""
-        try:
-            response = requests.get(f"{OLLAMA_BASE_URL}/tags")
-            return response.status_code == 200
-        except requests.RequestException:
-            return False
+        return self._run_detached(lambda client: client.available())
     
     def load_chunks(self) -> None:
         """Load all chunks from the chunks directory."""
-        self.chunks = []
-        chunk_files = list(self.chunks_dir.glob("*/*chunk_*.txt"))
+        self.chunks = list(tqdm(iter_chunks(self.chunks_dir), desc="Loading chunks"))
+        self.documents.update(chunk["document"] for chunk in self.chunks)
         
-        # Sort files for consistent loading
-        chunk_files.sort()
+        # Drop placeholder runs, dot leaders and other low-information chunks before embedding
+        quality_config = self.config.get('quality', {})
+        if quality_config.get('min_chunk_quality_score'):
+            self.chunks, report = filter_chunks(self.chunks, quality_config['min_chunk_quality_score'],
+                                                quality_config.get('low_quality_action', 'drop'))
+            logger.info(f"Quality scoring: {report['low_quality']} of {report['chunks']} chunks below "
+                        f"{quality_config['min_chunk_quality_score']} (mean score {report['mean_score']:.2f})")
         
-        for chunk_file in tqdm(chunk_files, desc="Loading chunks"):
-            doc_name = chunk_file.parent.name
-            self.documents.add(doc_name)
-            
-            with open(chunk_file, 'r', encoding='utf-8') as f:
-                content = f.read()
-                self.chunks.append({
-                    "document": doc_name,
-                    "id": chunk_file.stem,
-                    "content": content,
-                    "file_path": str(chunk_file)
-                })
+        # Collapse repeated boilerplate so each copy is embedded and indexed once
+        if quality_config.get('check_duplicates', False):
+            # The matches are saved next to the BM25 index and reused until the chunks change
+            self.chunks, report = deduplicate(self.chunks, quality_config.get('near_duplicate_threshold', 0.9),
+                                              self.ollama_dir / "duplicate_matches.json")
+            logger.info(f"Deduplication kept {report['unique']} of {report['chunks']} chunks "
+                        f"({report['exact_duplicates']} exact, {report['near_duplicates']} near duplicates): "
+                        f"{report['removed']} fewer embedding calls and index rows, "
+                        f"{report['characters_saved'] / 1e6:.2f} M characters not embedded")
+        
+        # Index chunks by (document, id) for O(1) lookup of search hits
+        self.chunk_index = {(chunk["document"], chunk["id"]): chunk for chunk in self.chunks}
+        
+        # Keyword index for hybrid retrieval; catches product codes embeddings miss
+        self.lexical_index = BM25Index.load_or_build(self.chunks, self.ollama_dir / "lexical_index.json")
         
         logger.info(f"Loaded {len(self.chunks)} chunks from {len(self.documents)} documents")
     
@@ -85,197 +141,268 @@ Your goal is to provide technically precise assistance with IBM technologies."""
             logger.error("No chunks loaded. Call load_chunks() first.")
             return
         
-        embedding_cache_file = self.ollama_dir / f"embeddings_cache_{self.model.replace(':', '_')}.json"
-        
-        # Check if embeddings cache exists
-        if embedding_cache_file.exists():
-            try:
-                with open(embedding_cache_file, 'r', encoding='utf-8') as f:
-                    cache_data = json.load(f)
-                    
-                    # Validate cache structure
-                    if "model" in cache_data and cache_data["model"] == self.model and "embeddings" in cache_data:
-                        logger.info(f"Loading embeddings from cache ({len(cache_data['embeddings'])} embeddings)")
-                        
-                        # Check if cache has all current chunks
-                        cache_ids = {item["id"] for item in cache_data["embeddings"]}
-                        current_ids = {chunk["id"] for chunk in self.chunks}
-                        
-                        if cache_ids.issuperset(current_ids):
-                            # Cache is complete
-                            self.embeddings = cache_data["embeddings"]
-                            logger.info("Using cached embeddings")
-                            return
-                        else:
-                            logger.info(f"Cache is incomplete. Missing {len(current_ids - cache_ids)} chunks. Regenerating all embeddings.")
-            except Exception as e:
-                logger.error(f"Error loading embeddings cache: {str(e)}")
-        
-        # Generate embeddings for all chunks
-        self.embeddings = []
-        
-        for chunk in tqdm(self.chunks, desc="Generating embeddings"):
-            try:
-                # Call Ollama Embeddings API
-                response = requests.post(
-                    f"{OLLAMA_BASE_URL}/embeddings",
-                    json={"model": self.model, "prompt": chunk["content"]}
-                )
-                
-                if response.status_code == 200:
-                    data = response.json()
-                    self.embeddings.append({
-                        "id": chunk["id"],
-                        "document": chunk["document"],
-                        "embedding": data["embedding"],
-                        "file_path": chunk["file_path"]
-                    })
-                else:
-                    logger.error(f"Error generating embedding for {chunk['id']}: {response.text}")
-            except Exception as e:
-                logger.error(f"Exception generating embedding for {chunk['id']}: {str(e)}")
-        
-        # Save embeddings to cache
-        try:
-            with open(embedding_cache_file, 'w', encoding='utf-8') as f:
-                json.dump({
-                    "model": self.model,
-                    "date_generated": time.strftime("%Y-%m-%d %H:%M:%S"),
-                    "embeddings": self.embeddings
-                }, f)
-            logger.info(f"Saved {len(self.embeddings)} embeddings to cache")
-        except Exception as e:
-            logger.error(f"Error saving embeddings cache: {str(e)}")
+        # Memory-map the existing store, then embed only chunks whose content is new
+        self.embeddings.load()
+        stats = self.embeddings.update(self.chunks, self._embed_texts)
+        logger.info(f"Embeddings: {stats['reused']} reused, {stats['embedded']} generated, "
+                    f"{stats['removed']} removed, {stats['failed']} failed")
+    
+    def _embed_texts(self, texts: List[str]) -> List[Any]:
+        """Embed a list of texts with Ollama, returning None for texts that failed."""
+        return self._run_detached(lambda client: client.embed(texts, show_progress=True))
     
     def prepare_for_ollama(self) -> None:
-        """Prepare data for Ollama by creating JSONL files."""
+        """Prepare data for Ollama by creating JSONL files.
+        
+        Chunks are grouped by document in one pass. A document's file is only
+        rewritten when the hash of its chunks differs from the last run, as
+        recorded in prepare_state.json. all_redbooks.jsonl is the per-document
+        files concatenated byte for byte, and is only rebuilt when one of them
+        changed.
+        """
         if not self.chunks:
             logger.error("No chunks loaded. Call load_chunks() first.")
             return
         
-        # Create JSONL file for each document
-        for document in self.documents:
-            doc_chunks = [chunk for chunk in self.chunks if chunk["document"] == document]
-            
-            if not doc_chunks:
-                continue
-            
+        # Group chunks by document, keeping corpus order
+        groups: Dict[str, List[Dict[str, Any]]] = {}
+        for chunk in self.chunks:
+            groups.setdefault(chunk["document"], []).append(chunk)
+        
+        state_file = self.ollama_dir / "prepare_state.json"
+        previous = {}
+        if state_file.exists():
+            try:
+                with open(state_file, 'r', encoding='utf-8') as f:
+                    state = json.load(f)
+                if state.get("version") == PREPARE_STATE_VERSION:
+                    previous = state["documents"]
+            except (json.JSONDecodeError, KeyError):
+                logger.warning("Prepare state corrupted, rewriting every JSONL file")
+        
+        # Create JSONL file for each document whose chunks changed
+        documents = {}
+        written = 0
+        for document, doc_chunks in groups.items():
             jsonl_file = self.ollama_dir / f"{document}.jsonl"
+            hasher = hashlib.blake2b(digest_size=16)
+            for chunk in doc_chunks:
+                for part in (chunk["id"], chunk["file_path"], chunk["content"]):
+                    hasher.update(part.encode('utf-8'))
+                    hasher.update(b"\0")
+            documents[document] = hasher.hexdigest()
+            if previous.get(document) == documents[document] and jsonl_file.exists():
+                continue
             
-            with open(jsonl_file, 'w', encoding='utf-8') as f:
+            tmp_file = jsonl_file.with_suffix(".jsonl.tmp")
+            with open(tmp_file, 'w', encoding='utf-8') as f:
                 for chunk in doc_chunks:
                     entry = {
                         "text": chunk["content"],
                         "metadata": {
                             "source": chunk["file_path"],
+                            "document": document,
                             "chunk_id": chunk["id"]
                         }
                     }
                     f.write(json.dumps(entry, ensure_ascii=False) + "\n")
-            
+            os.replace(tmp_file, jsonl_file)
+            written += 1
             logger.info(f"Created {jsonl_file} with {len(doc_chunks)} chunks")
         
-        # Create a combined JSONL file with all chunks
+        removed = [document for document in previous if document not in documents]
+        for document in removed:
+            (self.ollama_dir / f"{document}.jsonl").unlink(missing_ok=True)
+        
+        # Create a combined JSONL file with all chunks from the per-document files
         combined_file = self.ollama_dir / "all_redbooks.jsonl"
-        with open(combined_file, 'w', encoding='utf-8') as f:
-            for chunk in self.chunks:
-                entry = {
-                    "text": chunk["content"],
-                    "metadata": {
-                        "source": chunk["file_path"],
-                        "document": chunk["document"],
-                        "chunk_id": chunk["id"]
-                    }
-                }
-                f.write(json.dumps(entry, ensure_ascii=False) + "\n")
+        if written or removed or list(previous) != list(documents) or not combined_file.exists():
+            tmp_file = combined_file.with_suffix(".jsonl.tmp")
+            with open(tmp_file, 'wb') as combined:
+                for document in documents:
+                    with open(self.ollama_dir / f"{document}.jsonl", 'rb') as f:
+                        shutil.copyfileobj(f, combined)
+            os.replace(tmp_file, combined_file)
+            logger.info(f"Created combined file {combined_file} with {len(self.chunks)} chunks")
+        
+        with open(state_file, 'w', encoding='utf-8') as f:
+            json.dump({"version": PREPARE_STATE_VERSION, "documents": documents}, f, indent=2)
+        logger.info(f"Ollama JSONL files: {written} written, {len(documents) - written} unchanged, {len(removed)} removed")
+    
+    async def search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
+        """Retrieve context for a query using the configured retrieval mode (hybrid by default).
+        
+        The query is embedded over the async client while BM25 runs in a thread.
+        """
+        mode = self.config.get('retrieval', {}).get('mode', 'hybrid')
+        # Every mode goes through fusion, so results carry the same score, sources and quality weighting
+        retrievers = {}
+        if mode != 'vector':
+            retrievers["lexical"] = self._lexical_ranking
+        if mode in ('hybrid', 'vector'):
+            retrievers["vector"] = self._vector_ranking
+        
+        retriever = HybridRetriever.from_config(retrievers, self.config)
+        return self._search_results(await retriever.search(query, max(num_results, retriever.candidates)), num_results)
+    
+    def _search_results(self, fused: List[Dict[str, Any]], num_results: int) -> List[Dict[str, Any]]:
+        """Apply quality weights to fused results and return the top ``num_results`` as search results."""
+        # Chunks kept with a quality score (quality.low_quality_action: downweight) rank lower in proportion
+        for result in fused:
+            result["score"] *= self.chunk_index[result["key"]].get("quality", 1.0)
+        fused.sort(key=lambda result: result["score"], reverse=True)
         
-        logger.info(f"Created combined file {combined_file} with {len(self.chunks)} chunks")
+        return [{
+            "chunk": self.chunk_index[result["key"]],
+            "similarity": result["scores"].get("vector"),
+            "score": result["score"],
+            "sources": sorted(result["ranks"])
+        } for result in fused[:num_results]]
     
-    def vector_search(self, query: str, num_results: int = 5) -> List[Dict[str, Any]]:
-        """Perform vector search for a query."""
+    async def _vector_ranking(self, query: str, num_results: int) -> List[Any]:
+        """Rank chunks by embedding similarity, as ((document, id), similarity) pairs."""
         if not self.embeddings:
             logger.error("No embeddings available. Call generate_embeddings() first.")
             return []
         
         try:
-            # Get embedding for the query
-            response = requests.post(
-                f"{OLLAMA_BASE_URL}/embeddings",
-                json={"model": self.model, "prompt": query}
-            )
-            
-            if response.status_code != 200:
-                logger.error(f"Error getting query embedding: {response.text}")
+            query_embedding = await self.embed_query(query)
+            if query_embedding is None:
+                logger.error("Error getting query embedding")
                 return []
-            
-            query_embedding = response.json()["embedding"]
-            
-            # Calculate cosine similarity with all embeddings
-            similarities = []
-            for i, item in enumerate(self.embeddings):
-                chunk_embedding = item["embedding"]
-                similarity = self.cosine_similarity(query_embedding, chunk_embedding)
-                similarities.append((i, similarity))
-            
-            # Sort by similarity (highest first)
-            similarities.sort(key=lambda x: x[1], reverse=True)
-            
-            # Get top results
-            top_results = []
-            for i, sim in similarities[:num_results]:
-                embedding_item = self.embeddings[i]
-                
-                # Find the corresponding chunk
-                chunk = next((c for c in self.chunks if c["id"] == embedding_item["id"]), None)
-                
-                if chunk:
-                    top_results.append({
-                        "chunk": chunk,
-                        "similarity": sim
-                    })
-            
-            return top_results
+            return await asyncio.to_thread(self._rank_embeddings, query_embedding, num_results)
         
+        except asyncio.CancelledError:
+            raise
         except Exception as e:
             logger.error(f"Error in vector search: {str(e)}")
             return []
     
-    def cosine_similarity(self, vec1, vec2):
-        """Calculate cosine similarity between two vectors."""
-        vec1 = np.array(vec1)
-        vec2 = np.array(vec2)
-        return np.dot(vec1, vec2) / (np.linalg.norm(vec1) * np.linalg.norm(vec2))
+    def _rank_embeddings(self, query_embedding: Any, num_results: int) -> List[Any]:
+        """Score all embeddings against a query vector at once and pick the top results."""
+        ranking = []
+        for i, sim in self.embeddings.search(query_embedding, num_results):
+            embedding_item = self.embeddings.row(i)
+            key = (embedding_item["document"], embedding_item["id"])
+            
+            if key in self.chunk_index:
+                ranking.append((key, sim))
+        
+        return ranking
     
-    def query_ollama(self, query: str, context: str = "") -> str:
-        """Query Ollama with RAG context."""
+    async def embed_query(self, query: str) -> Any:
+        """Embed a query, reusing the cached vector for repeated questions."""
+        key = cache_key(self.model, normalize_query(query))
+        query_embedding = self.query_embedding_cache.get(key)
+        if query_embedding is None:
+            query_embedding = await self.async_client.embed_one(query)
+            if query_embedding is not None:
+                self.query_embedding_cache.set(key, query_embedding)
+        return query_embedding
+    
+    def _lexical_ranking(self, query: str, num_results: int) -> List[Any]:
+        """Rank chunks by BM25 score, as ((document, id), score) pairs."""
+        if self.lexical_index is None:
+            return []
+        
+        ranking = []
+        for position, score in self.lexical_index.search(query, num_results):
+            chunk = self.chunks[position]
+            ranking.append(((chunk["document"], chunk["id"]), score))
+        return ranking
+    
+    def build_messages(self, query: str, context: str = "") -> List[Dict[str, str]]:
+        """Build the /api/chat message list for a query and its retrieved context."""
+        messages = [{"role": "system", "content": self.system_prompt}]
+        if context:
+            messages.append({"role": "user", "content": "Here is some context information:\n\n" + context})
+        messages.append({"role": "user", "content": query})
+        return messages
+    
+    def answer_key(self, query: str, chunk_ids: List[Any] = ()) -> str:
+        """Answer cache key: query, retrieved chunk ids, model and system prompt."""
+        return cache_key(normalize_query(query), [list(chunk_id) for chunk_id in chunk_ids],
+                         self.model, self.system_prompt_hash)
+    
+    async def answer_query(self, query: str, num_results: int = 3) -> Dict[str, Any]:
+        """Retrieve context and answer a query without printing, for the RAG server.
+        
+        Returns the answer, the search results it was based on and whether it
+        came from the answer cache. Errors from Ollama are raised; cancelling
+        the task aborts generation.
+        """
+        results = await self.search(query, num_results)
+        context = "\n\n---\n\n".join(r["chunk"]["content"] for r in results)
+        key = self.answer_key(query, [(r["chunk"]["document"], r["chunk"]["id"]) for r in results])
+        
+        cached = self.answer_cache.get(key)
+        if cached is not None:
+            return {"answer": cached, "results": results, "cached": True}
+        
+        response = await self.async_client.chat(self.build_messages(query, context))
+        self.answer_cache.set(key, response)
+        return {"answer": response, "results": results, "cached": False}
+    
+    async def answer_async(self, query: str, context: str = "", chunk_ids: List[Any] = ()) -> str:
+        """Generate an answer, printing it token by token when streaming is enabled.
+        
+        Answers are cached by query, retrieved chunk ids, model and system prompt,
+        so asking the same question against the same context is served instantly.
+        Cancelling the task stops generation; a partial answer is not cached.
+        """
+        key = self.answer_key(query, chunk_ids)
+        
+        print(f"\n{Fore.CYAN}=== Response ==={Style.RESET_ALL}")
+        cached = self.answer_cache.get(key)
+        if cached is not None:
+            print(cached)
+            print(f"{Fore.GREEN}(cached answer){Style.RESET_ALL}")
+            return cached
+        
+        messages = self.build_messages(query, context)
         try:
-            payload = {
-                "model": self.model,
-                "prompt": query,
-                "system": self.system_prompt,
-                "stream": False
-            }
-            
-            if context:
-                payload["context"] = [
-                    {"role": "system", "content": self.system_prompt},
-                    {"role": "user", "content": "Here is some context information:\n\n" + context}
-                ]
-            
-            response = requests.post(
-                f"{OLLAMA_BASE_URL}/chat",
-                json=payload
-            )
-            
-            if response.status_code == 200:
-                return response.json()["message"]["content"]
+            if self.config.get('generation', {}).get('stream', True):
+                fragments = []
+                async for fragment in self.async_client.stream_chat(messages):
+                    fragments.append(fragment)
+                    print(fragment, end="", flush=True)
+                print()
+                response = "".join(fragments)
+                
+                stats = self.async_client.last_stats
+                if stats.get("time_to_first_token") is not None:
+                    print(f"{Fore.GREEN}(first token {stats['time_to_first_token']:.2f}s, "
+                          f"{stats['tokens']} tokens at {stats['tokens_per_sec']:.1f} tokens/sec){Style.RESET_ALL}")
+                    logger.info(f"Answer stats: time to first token {stats['time_to_first_token']:.3f}s, "
+                                f"{stats['tokens_per_sec']:.1f} tokens/sec")
             else:
-                logger.error(f"Error querying Ollama: {response.status_code} - {response.text}")
-                return f"Error querying the model. Status code: {response.status_code}"
+                response = await self.async_client.chat(messages)
+                print(response)
         
+        except httpx.HTTPStatusError as e:
+            logger.error(f"Error querying Ollama: {e.response.status_code} - {e.response.text}")
+            print(f"Error querying the model. Status code: {e.response.status_code}")
+            return ""
         except Exception as e:
             logger.error(f"Exception querying Ollama: {str(e)}")
-            return f"Error: {str(e)}"
+            print(f"Error: {str(e)}")
+            return ""
+        
+        self.answer_cache.set(key, response)
+        return response
+    
+    async def aclose(self) -> None:
+        """Close the async client's connection pool."""
+        await self.async_client.aclose()
+    
+    def save_caches(self) -> None:
+        """Persist the query caches and log their hit/miss counters."""
+        for name, cache in [("Query embedding", self.query_embedding_cache), ("Answer", self.answer_cache)]:
+            cache.save()
+            stats = cache.stats()
+            logger.info(f"{name} cache: {stats['hits']} hits, {stats['misses']} misses "
+                        f"({stats['hit_rate'] * 100:.0f}% hit rate), {stats['evictions']} evictions, "
+                        f"{stats['expirations']} expired, {stats['size']} entries")
     
     def interactive_query(self) -> None:
         """Run an interactive RAG query session."""
@@ -296,40 +423,78 @@ Your goal is to provide technically precise assistance with IBM technologies."""
         print(f"Loaded {len(self.chunks)} chunks from {len(self.documents)} documents")
         print("Type 'exit' or 'quit' to end the session")
         
-        while True:
-            query = input(f"\n{Fore.BLUE}Enter your query: {Style.RESET_ALL}")
-            
-            if query.lower() in ['exit', 'quit']:
-                print("Exiting RAG system. Goodbye!")
-                break
-            
-            if not query.strip():
-                continue
-            
-            # Find relevant chunks
-            print("Searching for relevant context...")
-            results = self.vector_search(query, num_results=3)
-            
-            if not results:
-                print(f"{Fore.YELLOW}No relevant context found. Querying without context...{Style.RESET_ALL}")
-                response = self.query_ollama(query)
-            else:
-                # Combine context from top results
-                context = "\n\n---\n\n".join([r["chunk"]["content"] for r in results])
+        asyncio.run(self._interactive_session())
+    
+    async def _interactive_session(self) -> None:
+        """Prompt loop of the interactive session; Ctrl+C during an answer cancels just that answer."""
+        loop = asyncio.get_running_loop()
+        try:
+            while True:
+                # Ctrl+C at the prompt ends the session
+                signal.signal(signal.SIGINT, signal.default_int_handler)
+                query = input(f"\n{Fore.BLUE}Enter your query: {Style.RESET_ALL}")
                 
-                # Show sources
-                print(f"{Fore.GREEN}Found {len(results)} relevant chunks:{Style.RESET_ALL}")
-                for i, result in enumerate(results):
-                    doc_name = result["chunk"]["document"]
-                    similarity = result["similarity"] * 100
-                    print(f"  {i+1}. {doc_name} (similarity: {similarity:.1f}%)")
+                if query.lower() in ['exit', 'quit']:
+                    print("Exiting RAG system. Goodbye!")
+                    break
                 
-                # Query with context
-                response = self.query_ollama(query, context)
-            
-            # Display response
-            print(f"\n{Fore.CYAN}=== Response ==={Style.RESET_ALL}")
-            print(response)
+                if not query.strip():
+                    continue
+                
+                turn = asyncio.create_task(self._answer_turn(query))
+                signal.signal(signal.SIGINT, lambda signum, frame: loop.call_soon_threadsafe(turn.cancel))
+                try:
+                    await turn
+                except asyncio.CancelledError:
+                    print(f"\n{Fore.YELLOW}(answer cancelled){Style.RESET_ALL}")
+                except Exception as e:
+                    # A failed turn must not end the session
+                    logger.error(f"Error answering query: {str(e)}")
+                    print(f"{Fore.RED}Error: {str(e)}{Style.RESET_ALL}")
+        finally:
+            signal.signal(signal.SIGINT, signal.default_int_handler)
+            self.save_caches()
+            await self.aclose()
+    
+    async def _answer_turn(self, query: str) -> None:
+        """Search for context and answer one query."""
+        # Find relevant chunks; the query embedding overlaps the keyword search
+        print("Searching for relevant context...")
+        results = await self.search(query, num_results=3)
+        
+        if not results:
+            print(f"{Fore.YELLOW}No relevant context found. Querying without context...{Style.RESET_ALL}")
+            await self.answer_async(query)
+            return
+        
+        # Combine context from top results
+        context = "\n\n---\n\n".join([r["chunk"]["content"] for r in results])
+        
+        # Show sources
+        print(f"{Fore.GREEN}Found {len(results)} relevant chunks:{Style.RESET_ALL}")
+        for i, result in enumerate(results):
+            doc_name = result["chunk"]["document"]
+            copies = len(result["chunk"].get("duplicates", []))
+            if copies:
+                doc_name += f" (+{copies} duplicate{'s' if copies > 1 else ''})"
+            if result["similarity"] is not None:
+                similarity = result["similarity"] * 100
+                print(f"  {i+1}. {doc_name} (similarity: {similarity:.1f}%)")
+            else:
+                print(f"  {i+1}. {doc_name} (keyword match)")
+        
+        # Query with context
+        chunk_ids = [(r["chunk"]["document"], r["chunk"]["id"]) for r in results]
+        await self.answer_async(query, context, chunk_ids)
+
+def build_rag(chunks_dir: Path, ollama_dir: Path, model: str, config: Dict[str, Any],
+              async_client: Optional[AsyncOllamaClient] = None,
+              caches: Optional[Tuple[VectorCache, LRUCache]] = None) -> OllamaRAG:
+    """Create an OllamaRAG with chunks, lexical index and embeddings loaded; the RAG server's factory."""
+    rag = OllamaRAG(chunks_dir, ollama_dir, model, config, async_client, caches)
+    rag.load_chunks()
+    rag.generate_embeddings()
+    return rag
 
 def main():
     parser = argparse.ArgumentParser(description="Ollama RAG Integration for IBM Redbooks")
@@ -339,8 +504,15 @@ def main():
                         help=f"Ollama model to use (default: {DEFAULT_MODEL})")
     parser.add_argument("--prepare", action="store_true", 
                         help="Prepare data for Ollama without starting interactive query")
+    parser.add_argument("--serve", action="store_true",
+                        help="Run the resident HTTP RAG server (see the server section of config.yaml)")
+    parser.add_argument("--config", type=str, default="config.yaml",
+                        help="Path to configuration file")
     args = parser.parse_args()
     
+    # Load configuration if available; defaults are used otherwise
+    config = ConfigLoader(args.config).config if Path(args.config).exists() else {}
+    
     chunks_dir = Path(args.data_dir) / "processed_redbooks" / "chunks"
     ollama_dir = Path(args.data_dir) / "processed_redbooks" / "ollama"
     
@@ -352,7 +524,7 @@ def main():
     # Create Ollama directory if it doesn't exist
     ollama_dir.mkdir(parents=True, exist_ok=True)
     
-    rag = OllamaRAG(chunks_dir, ollama_dir, args.model)
+    rag = OllamaRAG(chunks_dir, ollama_dir, args.model, config)
     
     # Check if Ollama is available
     if not rag.check_ollama_available():
@@ -360,6 +532,15 @@ def main():
         logger.error(f"Ollama server not available at {OLLAMA_BASE_URL}")
         return
     
+    # Keep indexes warm in one process and answer over HTTP instead of starting a session
+    if args.serve:
+        from rag_server import run_server
+        # Reloaded instances keep using this instance's connection pool and caches
+        async_client = rag.async_client
+        caches = (rag.query_embedding_cache, rag.answer_cache)
+        run_server(lambda: build_rag(chunks_dir, ollama_dir, args.model, config, async_client, caches), chunks_dir, config)
+        return
+    
     # Load chunks
     print("Loading chunks...")
     rag.load_chunks()
@@ -0,0 +1,245 @@
+import asyncio
+import json
+import logging
+import time
+from typing import List, Dict, Any, Optional, AsyncIterator
+
+import httpx
+from tqdm import tqdm
+
+logger = logging.getLogger(__name__)
+# httpx logs every request at INFO
+logging.getLogger("httpx").setLevel(logging.WARNING)
+
+# Ollama API settings
+OLLAMA_BASE_URL = "http://localhost:11434/api"
+
+def chat_stats(final: Dict[str, Any], start_time: float,
+               first_token_time: Optional[float], fragments: int) -> Dict[str, Any]:
+    """Compute timing statistics, preferring the server's own token counts when present."""
+    end_time = time.time()
+    eval_count = final.get("eval_count")
+    eval_duration = final.get("eval_duration")  # nanoseconds
+
+    if eval_count and eval_duration:
+        tokens = eval_count
+        tokens_per_sec = eval_count / (eval_duration / 1e9)
+    else:
+        tokens = fragments
+        generation_start = first_token_time or start_time
+        tokens_per_sec = tokens / (end_time - generation_start) if end_time > generation_start else 0.0
+
+    return {
+        "time_to_first_token": (first_token_time - start_time) if first_token_time else None,
+        "total_seconds": end_time - start_time,
+        "tokens": tokens,
+        "tokens_per_sec": tokens_per_sec
+    }
+
+class AsyncOllamaClient:
+    """Asyncio client for the Ollama server checks, embeddings and chat.
+
+    All calls share one httpx connection pool of ``max_connections`` keep-alive
+    connections. Embedding requests are bounded by ``embed_timeout`` seconds
+    and chat requests by ``chat_timeout``; either falls back to ``timeout``
+    when unset. Texts are embedded in batches on ``/api/embed``; servers that
+    only offer the single-prompt ``/api/embeddings`` endpoint are detected on
+    the first 404 and handled one text per request. Cancelling the task
+    awaiting a call, for example when the user aborts an answer, closes its
+    connection. Ollama then stops generating.
+
+    The httpx pool is bound to the event loop that first uses the client, so
+    one client must not be shared between ``asyncio.run`` calls.
+    """
+
+    def __init__(self, model: str, base_url: str = OLLAMA_BASE_URL, timeout: Optional[float] = None,
+                 max_connections: int = 8, batch_size: int = 32, max_concurrency: int = 4,
+                 retry_attempts: int = 3, retry_delay: float = 5,
+                 embed_timeout: Optional[float] = None, chat_timeout: Optional[float] = None):
+        self.model = model
+        self.base_url = base_url.rstrip('/')
+        self.timeout = timeout
+        self.embed_timeout = self._timeout(embed_timeout or timeout)
+        self.chat_timeout = self._timeout(chat_timeout or timeout)
+        self.batch_size = max(1, batch_size)
+        self.max_concurrency = max(1, max_concurrency)
+        self.retry_attempts = max(0, retry_attempts)
+        self.retry_delay = retry_delay
+        self.supports_batch: Optional[bool] = None
+        self.last_stats: Dict[str, Any] = {}
+        self.last_embed_stats: Dict[str, Any] = {}
+        self.client = httpx.AsyncClient(
+            base_url=self.base_url,
+            timeout=self._timeout(timeout),
+            limits=httpx.Limits(max_connections=max(1, max_connections),
+                                max_keepalive_connections=max(1, max_connections))
+        )
+
+    @classmethod
+    def from_config(cls, model: str, config: Dict[str, Any], base_url: str = OLLAMA_BASE_URL) -> "AsyncOllamaClient":
+        """Build a client from the ``processing``, ``embeddings``, ``generation`` and ``server`` sections of config.yaml."""
+        processing_config = config.get('processing', {})
+        embeddings_config = config.get('embeddings', {})
+        return cls(
+            model,
+            base_url=base_url,
+            timeout=processing_config.get('timeout'),
+            max_connections=config.get('server', {}).get('max_workers', 8),
+            batch_size=embeddings_config.get('batch_size', 32),
+            max_concurrency=embeddings_config.get('max_concurrency', 4),
+            retry_attempts=processing_config.get('retry_attempts', 3),
+            retry_delay=processing_config.get('retry_delay', 5),
+            embed_timeout=embeddings_config.get('request_timeout'),
+            chat_timeout=config.get('generation', {}).get('request_timeout')
+        )
+
+    @staticmethod
+    def _timeout(seconds: Optional[float]) -> httpx.Timeout:
+        """``seconds`` for the whole request, but at most 10 seconds to connect."""
+        return httpx.Timeout(seconds, connect=min(seconds or 10, 10))
+
+    async def available(self) -> bool:
+        """Check that the Ollama server answers."""
+        try:
+            response = await self.client.get("/tags", timeout=min(self.timeout or 5, 5))
+            return response.status_code == 200
+        except httpx.HTTPError:
+            return False
+
+    async def embed(self, texts: List[str], show_progress: bool = False) -> List[Optional[List[float]]]:
+        """Embed texts in batches, with at most ``max_concurrency`` requests in flight.
+
+        Returns one vector per text, None where embedding failed.
+        """
+        if not texts:
+            return []
+
+        start_time = time.time()
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        batches = [texts[start:start + self.batch_size] for start in range(0, len(texts), self.batch_size)]
+
+        with tqdm(total=len(texts), desc="Generating embeddings", disable=not show_progress) as progress:
+            async def embed_batch(start: int, batch: List[str]) -> List[Optional[List[float]]]:
+                async with semaphore:
+                    try:
+                        return await self._embed_batch(batch)
+                    except Exception as e:
+                        logger.error(f"Embedding batch at offset {start} failed: {str(e)}")
+                        return [None] * len(batch)
+                    finally:
+                        progress.update(len(batch))
+
+            results = await asyncio.gather(*(embed_batch(i * self.batch_size, batch) for i, batch in enumerate(batches)))
+        vectors = [vector for batch in results for vector in batch]
+
+        elapsed = time.time() - start_time
+        succeeded = sum(1 for vector in vectors if vector is not None)
+        self.last_embed_stats = {
+            "chunks": len(texts),
+            "succeeded": succeeded,
+            "requests": len(batches) if self.supports_batch is not False else len(texts),
+            "seconds": elapsed,
+            "chunks_per_sec": succeeded / elapsed if elapsed > 0 else 0.0
+        }
+        logger.info(f"Embedded {succeeded}/{len(texts)} chunks in {elapsed:.2f}s "
+                    f"({self.last_embed_stats['chunks_per_sec']:.1f} chunks/sec)")
+        return vectors
+
+    async def embed_one(self, text: str) -> Optional[List[float]]:
+        """Embed a single text, e.g. a query."""
+        return (await self._embed_batch([text]))[0]
+
+    async def _embed_batch(self, batch: List[str]) -> List[Optional[List[float]]]:
+        """Embed one batch, preferring the array-capable /api/embed endpoint."""
+        if self.supports_batch is not False:
+            response = await self._post("/embed", {"model": self.model, "input": batch})
+            if response is not None and response.status_code == 404:
+                logger.info("Ollama server has no /api/embed endpoint, falling back to /api/embeddings")
+                self.supports_batch = False
+            elif response is not None and response.status_code == 200:
+                self.supports_batch = True
+                return response.json()["embeddings"]
+            else:
+                self._log_failure(response)
+                return [None] * len(batch)
+
+        vectors = []
+        for text in batch:
+            response = await self._post("/embeddings", {"model": self.model, "prompt": text})
+            if response is not None and response.status_code == 200:
+                vectors.append(response.json()["embedding"])
+            else:
+                self._log_failure(response)
+                vectors.append(None)
+        return vectors
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Optional[httpx.Response]:
+        """POST with retries and exponential backoff on connection errors, 429 and 5xx responses."""
+        response = None
+        for attempt in range(self.retry_attempts + 1):
+            try:
+                response = await self.client.post(path, json=payload, timeout=self.embed_timeout)
+                if response.status_code != 429 and response.status_code < 500:
+                    return response
+                logger.warning(f"Ollama returned {response.status_code} for {path} (attempt {attempt + 1})")
+            except httpx.HTTPError as e:
+                response = None
+                logger.warning(f"Request to {path} failed (attempt {attempt + 1}): {str(e)}")
+
+            if attempt < self.retry_attempts:
+                await asyncio.sleep(self.retry_delay * (2 ** attempt))
+        return response
+
+    def _log_failure(self, response: Optional[httpx.Response]) -> None:
+        if response is None:
+            logger.error("Error generating embeddings: no response from Ollama")
+        else:
+            logger.error(f"Error generating embeddings: {response.status_code} - {response.text}")
+
+    async def chat(self, messages: List[Dict[str, str]]) -> str:
+        """Send a chat request and return the complete answer."""
+        start_time = time.time()
+        response = await self.client.post("/chat", json={"model": self.model, "messages": messages, "stream": False},
+                                          timeout=self.chat_timeout)
+        response.raise_for_status()
+        data = response.json()
+        self.last_stats = chat_stats(data, start_time, None, 0)
+        return data["message"]["content"]
+
+    async def stream_chat(self, messages: List[Dict[str, str]]) -> AsyncIterator[str]:
+        """Send a streaming chat request and yield content fragments as they arrive."""
+        start_time = time.time()
+        first_token_time = None
+        fragments = 0
+        final: Dict[str, Any] = {}
+
+        async with self.client.stream(
+            "POST", "/chat", json={"model": self.model, "messages": messages, "stream": True},
+            timeout=self.chat_timeout
+        ) as response:
+            if response.is_error:
+                # Read the error body so it is available on the raised exception
+                await response.aread()
+            response.raise_for_status()
+            async for line in response.aiter_lines():
+                if not line:
+                    continue
+                data = json.loads(line)
+                if "error" in data:
+                    raise RuntimeError(data["error"])
+
+                content = data.get("message", {}).get("content", "")
+                if content:
+                    if first_token_time is None:
+                        first_token_time = time.time()
+                    fragments += 1
+                    yield content
+
+                if data.get("done"):
+                    final = data
+                    break
+
+        self.last_stats = chat_stats(final, start_time, first_token_time, fragments)
+
+    async def aclose(self) -> None:
+        await self.client.aclose()
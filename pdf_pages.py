@@ -0,0 +1,117 @@
+import argparse
+import logging
+import time
+from pathlib import Path
+from typing import Dict, Any, Iterator, Tuple
+
+import fitz  # PyMuPDF
+
+logger = logging.getLogger(__name__)
+
+class PdfPages:
+    """One open PDF with lazily decoded, cached page text.
+
+    MetadataExtractor and DocumentProcessor share an instance so the file is
+    opened once and every page is decoded at most once, however many times
+    its text is asked for. ``pages_decoded`` counts actual decodes.
+    """
+
+    def __init__(self, pdf_path: Path, cache: bool = True):
+        self.path = Path(pdf_path)
+        self.doc = fitz.open(self.path)
+        self.cache = cache
+        self.pages_decoded = 0
+        self._texts: Dict[int, str] = {}
+
+    def __enter__(self) -> "PdfPages":
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def __len__(self) -> int:
+        return len(self.doc)
+
+    @property
+    def metadata(self) -> Dict[str, Any]:
+        return self.doc.metadata or {}
+
+    def text(self, page_num: int) -> str:
+        """Text of one page, decoded on first use."""
+        text = self._texts.get(page_num)
+        if text is None:
+            text = self.doc[page_num].get_text()
+            self.pages_decoded += 1
+            if self.cache:
+                self._texts[page_num] = text
+        return text
+
+    def iter_pages(self) -> Iterator[Tuple[int, str]]:
+        """Yield (page_no, text) for every page, numbering from 1.
+
+        Pages not already cached are decoded without being kept, so a full
+        pass over a large PDF only holds one page of text at a time.
+        """
+        for page_num in range(len(self.doc)):
+            text = self._texts.get(page_num)
+            if text is None:
+                text = self.doc[page_num].get_text()
+                self.pages_decoded += 1
+            yield page_num + 1, text
+
+    def close(self) -> None:
+        self._texts.clear()
+        self.doc.close()
+
+def count_decodes(pdf_path: Path, metadata_config: Dict[str, Any], shared: bool) -> Dict[str, Any]:
+    """Run metadata extraction plus a full text pass, counting page decodes.
+
+    With ``shared`` both steps use one cached PdfPages, as DocumentProcessor
+    does. Without it each step opens the PDF and decodes pages on every call,
+    which is how the two components worked before they shared pages.
+    """
+    from metadata_extractor import MetadataExtractor
+
+    extractor = MetadataExtractor(metadata_config)
+    start_time = time.time()
+    if shared:
+        with PdfPages(pdf_path) as pages:
+            extractor.extract_metadata(pdf_path, pages)
+            for _page in pages.iter_pages():
+                pass
+            decoded, page_count = pages.pages_decoded, len(pages)
+    else:
+        with PdfPages(pdf_path, cache=False) as pages:
+            extractor.extract_metadata(pdf_path, pages)
+            decoded = pages.pages_decoded
+        with PdfPages(pdf_path, cache=False) as pages:
+            for page_num in range(len(pages)):
+                pages.text(page_num)
+            decoded += pages.pages_decoded
+            page_count = len(pages)
+    return {"pages": page_count, "decoded": decoded, "seconds": time.time() - start_time}
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare pages decoded per PDF with and without shared page text")
+    parser.add_argument("--pdf_dir", type=str, default="pdfs", help="Directory containing PDF files")
+    parser.add_argument("--config", type=str, default="config.yaml", help="Path to configuration file")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    from config_loader import ConfigLoader
+    metadata_config = ConfigLoader(args.config).get_metadata_config()
+
+    print(f"{'PDF':<30} {'pages':>6} {'before':>8} {'after':>8} {'before s':>9} {'after s':>8}")
+    for pdf_path in sorted(Path(args.pdf_dir).glob("*.pdf")):
+        try:
+            before = count_decodes(pdf_path, metadata_config, shared=False)
+            after = count_decodes(pdf_path, metadata_config, shared=True)
+        except Exception as e:
+            logger.error(f"Error benchmarking {pdf_path}: {str(e)}")
+            continue
+        print(f"{pdf_path.name:<30} {after['pages']:>6} {before['decoded']:>8} {after['decoded']:>8} "
+              f"{before['seconds']:>9.2f} {after['seconds']:>8.2f}")
+
+if __name__ == "__main__":
+    main()
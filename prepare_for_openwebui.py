@@ -1,106 +1,160 @@
 import argparse
+import hashlib
+import itertools
 import json
 import logging
 import os
 import time
 import uuid
 from pathlib import Path
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, Optional
 
+import chunk_store
 from config_loader import ConfigLoader
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
-def load_chunks(processed_dir: Path) -> List[Dict[str, Any]]:
-    """Load all chunks from the processed documents directory."""
-    chunks = []
-    # Look for chunk files in all document directories
-    chunk_files = list(processed_dir.rglob("chunks/chunk_*.json"))
-
-    # Sort files for consistent loading
-    chunk_files.sort()
-
-    for chunk_file in chunk_files:
-        with open(chunk_file, 'r', encoding='utf-8') as f:
-            chunk_data = json.load(f)
-            chunks.append({
-                "document": chunk_file.parent.parent.name,
-                "id": chunk_file.stem,
-                "content": chunk_data["content"],
-                "metadata": chunk_data["metadata"],
-                "file_path": str(chunk_file)
-            })
-
-    logger.info(f"Loaded {len(chunks)} chunks from {len(set([c['document'] for c in chunks]))} documents")
-    return chunks
-
-def prepare_for_openwebui(chunks: List[Dict[str, Any]], output_dir: Path, collection_name: str = "IBM Z Knowledge Base") -> None:
-    """Convert chunks to Open WebUI format."""
+# Bump when the document file layout changes, so every document is written again
+EXPORT_VERSION = 2
+STATE_FILE = "export_state.json"
+
+def stable_id(*parts: str) -> str:
+    """UUID-formatted id derived from a hash of ``parts``, the same on every run."""
+    digest = hashlib.blake2b("\0".join(parts).encode('utf-8'), digest_size=16).digest()
+    return str(uuid.UUID(bytes=digest))
+
+def find_documents(processed_dir: Path) -> Dict[Path, List[Path]]:
+    """Find the chunk sources of all processed documents."""
+    # redbook-processor keeps its own chunks under processed_dir/chunks; only DocumentProcessor output has metadata
+    return chunk_store.find_chunk_sources(processed_dir, exclude=[processed_dir / "chunks"])
+
+def load_export_state(state_file: Path) -> Dict[str, Any]:
+    """Load what the previous export wrote, or an empty state if it is missing or from another version."""
+    if state_file.exists():
+        try:
+            with open(state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            if state.get("version") == EXPORT_VERSION:
+                return state
+        except json.JSONDecodeError:
+            logger.warning("Export state corrupted, exporting every document again")
+    return {"version": EXPORT_VERSION, "documents": {}}
+
+def write_json_atomic(path: Path, data: Any) -> None:
+    tmp_path = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+def write_document(doc_file: Path, doc_name: str, doc_id: str, chunks: Iterator[Dict[str, Any]],
+                   document_metadata: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """Stream one document's chunks into its Open WebUI file, one chunk in memory at a time.
+
+    Document metadata is written once, in the document header; each chunk
+    keeps only its document_id and chunk-local metadata (chunk number, word
+    count, pages). Without ``document_metadata`` the document-level fields of
+    the first chunk are used. Returns the metadata and chunk count, or None if
+    the document has no chunks.
+    """
+    first = next(chunks, None)
+    if first is None:
+        return None
+    metadata = document_metadata or chunk_store.split_metadata(first.get("metadata", {}))[0]
+
+    tmp_file = doc_file.with_suffix(doc_file.suffix + ".tmp")
+    chunk_count = 0
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        header = json.dumps({"id": doc_id, "name": doc_name, "metadata": metadata})
+        f.write(header[:-1] + ', "chunks": [')
+        for chunk in itertools.chain([first], chunks):
+            chunk_data = {
+                "id": stable_id(doc_name, chunk["id"], chunk["content"]),
+                "document_id": doc_id,
+                "content": chunk["content"],
+                "metadata": chunk_store.split_metadata(chunk.get("metadata", {}))[1]
+            }
+            f.write(("\n" if chunk_count == 0 else ",\n") + json.dumps(chunk_data))
+            chunk_count += 1
+        f.write("\n]}\n")
+    os.replace(tmp_file, doc_file)
+    return {"metadata": metadata, "chunk_count": chunk_count}
+
+def prepare_for_openwebui(processed_dir: Path, output_dir: Path, collection_name: str = "IBM Z Knowledge Base") -> Dict[str, int]:
+    """Convert processed documents to Open WebUI format.
+
+    Each document file is streamed from its chunk source. Ids are derived from
+    content hashes, so they stay the same across runs, and documents whose
+    source bytes match the previous export are not written again. Returns
+    counts of written, unchanged and removed documents.
+    """
     # Create directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Group chunks by document
-    docs = {}
-    for chunk in chunks:
-        doc_name = chunk["document"]
-        if doc_name not in docs:
-            docs[doc_name] = []
-        docs[doc_name].append(chunk)
+    state_file = output_dir / STATE_FILE
+    state = load_export_state(state_file)
+    previous = state["documents"]
+    documents = {}
+    stats = {"written": 0, "unchanged": 0, "removed": 0}
+
+    # Process each document
+    for source, chunk_files in find_documents(processed_dir).items():
+        doc_name = chunk_store.shard_document(source)
+        doc_file = output_dir / f"{doc_name}.json"
+        try:
+            source_hash = chunk_store.source_hash(source, chunk_files)
+            entry = previous.get(doc_name)
+            if entry and entry["source_hash"] == source_hash and doc_file.exists():
+                documents[doc_name] = entry
+                stats["unchanged"] += 1
+                continue
+
+            doc_id = stable_id(doc_name, source_hash)
+            written = write_document(doc_file, doc_name, doc_id, chunk_store.iter_source(source, chunk_files),
+                                     chunk_store.document_metadata(source))
+            if written is None:
+                continue
+            documents[doc_name] = {"id": doc_id, "file": doc_file.name, "source_hash": source_hash, **written}
+            stats["written"] += 1
+            logger.info(f"Created document file: {doc_file}")
+        except Exception as e:
+            logger.error(f"Error exporting {doc_name}: {str(e)}")
+            # Keep the previous export of a document that failed this time
+            if doc_name in previous:
+                documents[doc_name] = previous[doc_name]
+
+    # Documents that are no longer processed leave the collection
+    for doc_name, entry in previous.items():
+        if doc_name not in documents:
+            (output_dir / entry["file"]).unlink(missing_ok=True)
+            stats["removed"] += 1
+
+    state["documents"] = documents
+    write_json_atomic(state_file, state)
 
     # Create collection metadata
     collection_data = {
         "name": collection_name,
-        "id": str(uuid.uuid4()),
-        "document_count": len(docs),
-        "chunk_count": len(chunks),
+        "id": stable_id(collection_name),
+        "document_count": len(documents),
+        "chunk_count": sum(entry["chunk_count"] for entry in documents.values()),
         "created_at": time.strftime("%Y-%m-%d %H:%M:%S"),
-        "documents": []
-    }
-
-    # Process each document
-    for doc_name, doc_chunks in docs.items():
-        # Create document metadata
-        doc_id = str(uuid.uuid4())
-        document_data = {
-            "id": doc_id,
+        "documents": [{
+            "id": entry["id"],
             "name": doc_name,
-            "metadata": doc_chunks[0]["metadata"],  # Use metadata from first chunk
-            "chunks": []
-        }
-
-        # Add all chunks for this document
-        for chunk in doc_chunks:
-            chunk_data = {
-                "id": str(uuid.uuid4()),
-                "document_id": doc_id,
-                "content": chunk["content"],
-                "metadata": chunk["metadata"]
-            }
-            document_data["chunks"].append(chunk_data)
-
-        # Save individual document file
-        doc_file = output_dir / f"{doc_name}.json"
-        with open(doc_file, 'w', encoding='utf-8') as f:
-            json.dump(document_data, f, indent=2)
-        logger.info(f"Created document file: {doc_file}")
-
-        # Add document reference to collection
-        collection_data["documents"].append({
-            "id": doc_id,
-            "name": doc_name,
-            "file": doc_file.name,
-            "metadata": document_data["metadata"]
-        })
+            "file": entry["file"],
+            "metadata": entry["metadata"]
+        } for doc_name, entry in documents.items()]
+    }
 
     # Save collection file
     collection_file = output_dir / f"{collection_name.replace(' ', '_')}.json"
-    with open(collection_file, 'w', encoding='utf-8') as f:
-        json.dump(collection_data, f, indent=2)
+    write_json_atomic(collection_file, collection_data)
 
     logger.info(f"Created Open WebUI collection: {collection_file}")
-    logger.info(f"Collection contains {len(collection_data['documents'])} documents with {collection_data['chunk_count']} chunks")
+    logger.info(f"Collection contains {len(collection_data['documents'])} documents with {collection_data['chunk_count']} chunks "
+                f"({stats['written']} written, {stats['unchanged']} unchanged, {stats['removed']} removed)")
 
     # Create instruction file for importing
     instructions_file = output_dir / "import_instructions.md"
@@ -120,6 +174,7 @@ Note: The collection contains {len(collection_data['documents'])} separate docum
 """)
 
     logger.info(f"Created import instructions: {instructions_file}")
+    return stats
 
 def main():
     parser = argparse.ArgumentParser(description="Prepare data for Open WebUI integration")
@@ -142,11 +197,8 @@ def main():
     # Create output directory if it doesn't exist
     output_dir.mkdir(parents=True, exist_ok=True)
 
-    # Load chunks
-    chunks = load_chunks(processed_dir)
-
-    # Prepare for Open WebUI
-    prepare_for_openwebui(chunks, output_dir, config['collection']['name'])
+    # Prepare for Open WebUI, streaming each document's chunks
+    prepare_for_openwebui(processed_dir, output_dir, config['collection']['name'])
 
     print(f"Successfully prepared data for Open WebUI. Files saved to {output_dir}")
     print(f"Follow the instructions in {output_dir / 'import_instructions.md'} to import the collection.")
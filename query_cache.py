@@ -0,0 +1,189 @@
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Any, Optional
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+def normalize_query(query: str) -> str:
+    """Case- and whitespace-insensitive form of a query, so trivial variants share cache entries."""
+    return " ".join(query.lower().split())
+
+def cache_key(*parts: Any) -> str:
+    """Stable string key for a tuple of JSON-serializable parts."""
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+class LRUCache:
+    """Bounded least-recently-used cache with optional TTL and JSON persistence.
+
+    Entries older than ``ttl`` seconds are treated as misses and dropped. When
+    ``path`` is given, ``load`` and ``save`` keep the cache across sessions.
+    Hit, miss, eviction and expiry counters are kept for reporting.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None, path: Optional[Path] = None):
+        self.max_size = max(1, max_size)
+        self.ttl = ttl or None
+        self.path = Path(path) if path else None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self._dirty = False
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any], path: Optional[Path] = None) -> "LRUCache":
+        """Build a cache from one entry of the ``cache`` section of config.yaml."""
+        cache = cls(
+            max_size=config.get('max_size', 256),
+            ttl=config.get('ttl'),
+            path=path if config.get('persist') else None
+        )
+        cache.load()
+        return cache
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: str) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            stored_at, value = entry
+            if self.ttl and time.time() - stored_at > self.ttl:
+                del self._entries[key]
+                self.expirations += 1
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key: str, value: Any) -> None:
+        with self._lock:
+            self._entries[key] = (time.time(), value)
+            self._entries.move_to_end(key)
+            self._dirty = True
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "evictions": self.evictions,
+            "expirations": self.expirations
+        }
+
+    def load(self) -> None:
+        """Read persisted entries, skipping any that have already expired."""
+        if not self.path or not self.path.exists():
+            return
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                entries = json.load(f)
+            now = time.time()
+            with self._lock:
+                for key, stored_at, value in entries[-self.max_size:]:
+                    if not self.ttl or now - stored_at <= self.ttl:
+                        self._entries[key] = (stored_at, value)
+            logger.info(f"Loaded {len(self._entries)} cache entries from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading cache {self.path}: {str(e)}")
+
+    def save(self) -> None:
+        """Persist entries in LRU order, replacing the file atomically; a cache with no new entries is not rewritten."""
+        if not self.path or not self._dirty:
+            return
+        try:
+            with self._lock:
+                entries = [[key, stored_at, value] for key, (stored_at, value) in self._entries.items()]
+                self._dirty = False
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(entries, f, ensure_ascii=False)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.error(f"Error saving cache {self.path}: {str(e)}")
+
+class VectorCache(LRUCache):
+    """LRUCache of embedding vectors, persisted in binary.
+
+    Values are kept as float32 arrays. On disk they are one float32 ``.npy``
+    matrix at ``path``, with row order given by a ``.keys.json`` sidecar
+    holding each row's key and timestamp, as in EmbeddingStore. A 4096-dim
+    vector takes 16 KB instead of roughly 85 KB of JSON and loads without
+    parsing.
+    """
+
+    def __init__(self, max_size: int = 256, ttl: Optional[float] = None, path: Optional[Path] = None):
+        super().__init__(max_size, ttl, path)
+        self.keys_path = self.path.with_suffix(".keys.json") if self.path else None
+
+    def set(self, key: str, value: Any) -> None:
+        super().set(key, np.asarray(value, dtype=np.float32))
+
+    def load(self) -> None:
+        """Read the persisted matrix and keys, skipping entries that have already expired."""
+        if not self.path or not self.path.exists() or not self.keys_path.exists():
+            return
+        try:
+            with open(self.keys_path, 'r', encoding='utf-8') as f:
+                keys = json.load(f)
+            matrix = np.load(self.path)
+            if len(matrix) != len(keys):
+                logger.warning(f"Cache {self.path} does not match its keys file, starting empty")
+                return
+            now = time.time()
+            start = max(0, len(keys) - self.max_size)
+            with self._lock:
+                for (key, stored_at), vector in zip(keys[start:], matrix[start:]):
+                    if not self.ttl or now - stored_at <= self.ttl:
+                        self._entries[key] = (stored_at, vector)
+            logger.info(f"Loaded {len(self._entries)} cache entries from {self.path}")
+        except Exception as e:
+            logger.error(f"Error loading cache {self.path}: {str(e)}")
+
+    def save(self) -> None:
+        """Write the matrix, then the keys file, each replaced atomically."""
+        if not self.path or not self._dirty:
+            return
+        try:
+            with self._lock:
+                items = list(self._entries.items())
+                self._dirty = False
+            dims = {len(vector) for _key, (_stored_at, vector) in items}
+            if len(dims) > 1:
+                # Only possible if the model changed under the same cache file; keep the newest dimension
+                dim = len(items[-1][1][1])
+                items = [item for item in items if len(item[1][1]) == dim]
+
+            matrix = np.stack([vector for _key, (_stored_at, vector) in items]) if items else np.zeros((0, 0), np.float32)
+            tmp_path = self.path.with_suffix(self.path.suffix + ".tmp")
+            with open(tmp_path, 'wb') as f:
+                np.save(f, matrix)
+            os.replace(tmp_path, self.path)
+
+            tmp_keys = self.keys_path.with_suffix(".tmp")
+            with open(tmp_keys, 'w', encoding='utf-8') as f:
+                json.dump([[key, stored_at] for key, (stored_at, _vector) in items], f)
+            os.replace(tmp_keys, self.keys_path)
+        except Exception as e:
+            logger.error(f"Error saving cache {self.path}: {str(e)}")
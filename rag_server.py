@@ -0,0 +1,291 @@
+import asyncio
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Dict, Any, Callable, Optional, Tuple
+from urllib.parse import urlsplit, parse_qs
+
+from chunk_store import find_chunk_sources
+
+logger = logging.getLogger(__name__)
+
+MAX_BODY_BYTES = 1 << 20
+DISCONNECT_POLL_SECONDS = 0.25
+REASONS = {200: "OK", 202: "Accepted", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error", 502: "Bad Gateway", 503: "Service Unavailable"}
+
+def chunks_fingerprint(chunks_dir: Path) -> Tuple:
+    """Size and mtime of every chunk file under ``chunks_dir``; it changes whenever ingestion writes."""
+    entries = []
+    for path, chunk_files in find_chunk_sources(chunks_dir).items():
+        for file_path in chunk_files or [path]:
+            try:
+                stat = os.stat(file_path)
+            except OSError:
+                continue
+            entries.append((str(file_path), stat.st_size, stat.st_mtime_ns))
+    return tuple(entries)
+
+class RAGServer:
+    """Resident HTTP front end for a loaded OllamaRAG.
+
+    ``factory`` builds a fully loaded OllamaRAG (chunks, lexical index and
+    embeddings), so indexes are loaded once instead of on every invocation.
+    Searches and answers run as coroutines on the shared async Ollama client,
+    with CPU-bound scoring in worker threads, so a slow answer for one client
+    never holds up another. An answer whose client disconnects is cancelled,
+    which stops generation in Ollama.
+
+    Every ``reload_interval`` seconds the chunk files under ``chunks_dir`` are
+    checked. Once they have changed and then stayed the same for one more
+    interval, so ingestion is finished, a new instance is built in the
+    background. It replaces the old one atomically; requests already running
+    finish on the instance they started with. ``factory`` should hand every
+    instance the same async client and caches, so neither is lost on reload.
+    ``POST /reload`` forces a reload.
+
+    Endpoints:
+      GET  /health                        -> status, chunk and document counts
+      GET  /search?q=...&k=5, POST /search {"query", "num_results"}
+      POST /answer {"query", "num_results"} -> answer, sources, cached
+      POST /reload                        -> 202, rebuilds in the background
+    """
+
+    def __init__(self, factory: Callable[[], Any], chunks_dir: Path, host: str = "127.0.0.1", port: int = 8765,
+                 reload_interval: float = 30, max_workers: int = 8):
+        self.factory = factory
+        self.chunks_dir = Path(chunks_dir)
+        self.host = host
+        self.port = port
+        self.reload_interval = reload_interval
+        self.executor = ThreadPoolExecutor(max_workers=max(1, max_workers), thread_name_prefix="rag")
+        self.rag = None
+        self.loaded_at: Optional[float] = None
+        self._fingerprint: Tuple = ()
+        self._reload_task: Optional[asyncio.Task] = None
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    @classmethod
+    def from_config(cls, factory: Callable[[], Any], chunks_dir: Path, config: Dict[str, Any]) -> "RAGServer":
+        """Build a server from the ``server`` section of config.yaml."""
+        server_config = config.get('server', {})
+        return cls(
+            factory,
+            chunks_dir,
+            host=server_config.get('host', "127.0.0.1"),
+            port=server_config.get('port', 8765),
+            reload_interval=server_config.get('reload_interval', 30),
+            max_workers=server_config.get('max_workers', 8)
+        )
+
+    async def _run(self, func: Callable, *args) -> Any:
+        return await asyncio.get_running_loop().run_in_executor(self.executor, func, *args)
+
+    async def load(self) -> None:
+        """Build a new RAG instance off the event loop and swap it in."""
+        fingerprint = await self._run(chunks_fingerprint, self.chunks_dir)
+        start_time = time.time()
+        rag = await self._run(self.factory)
+        previous, self.rag = self.rag, rag
+        self._fingerprint = fingerprint
+        self.loaded_at = time.time()
+        logger.info(f"Loaded {len(rag.chunks)} chunks from {len(rag.documents)} documents "
+                    f"in {self.loaded_at - start_time:.1f} seconds")
+        if previous is not None:
+            # The caches and async client are shared with the new instance, so there is nothing to close
+            await self._run(previous.save_caches)
+
+    def request_reload(self) -> bool:
+        """Start a background reload unless one is already running."""
+        if self._reload_task is not None and not self._reload_task.done():
+            return False
+        self._reload_task = asyncio.create_task(self._reload())
+        return True
+
+    async def _reload(self) -> None:
+        try:
+            await self.load()
+        except Exception as e:
+            logger.error(f"Error reloading indexes, keeping the current ones: {str(e)}")
+
+    async def watch(self) -> None:
+        """Reload once the chunk files have changed and stopped changing."""
+        pending = None
+        while True:
+            await asyncio.sleep(self.reload_interval)
+            try:
+                fingerprint = await self._run(chunks_fingerprint, self.chunks_dir)
+            except Exception as e:
+                logger.error(f"Error checking {self.chunks_dir} for changes: {str(e)}")
+                continue
+            if fingerprint == self._fingerprint:
+                pending = None
+            elif fingerprint == pending:
+                logger.info("Chunk files changed; reloading indexes in the background")
+                self.request_reload()
+                pending = None
+            else:
+                pending = fingerprint
+
+    async def dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        """Route one request and return (status, JSON payload)."""
+        url = urlsplit(target)
+        params = {key: values[-1] for key, values in parse_qs(url.query).items()}
+        if body:
+            try:
+                params.update(json.loads(body))
+            except (json.JSONDecodeError, TypeError, ValueError):
+                return 400, {"error": "Request body must be a JSON object"}
+
+        if url.path == "/health":
+            return 200, {
+                "status": "ok" if self.rag is not None else "loading",
+                "chunks": len(self.rag.chunks) if self.rag is not None else 0,
+                "documents": len(self.rag.documents) if self.rag is not None else 0,
+                "loaded_at": self.loaded_at,
+                "reloading": self._reload_task is not None and not self._reload_task.done()
+            }
+        if url.path == "/reload":
+            if method != "POST":
+                return 405, {"error": "Use POST"}
+            return 202, {"reloading": True, "started": self.request_reload()}
+        if url.path not in ("/search", "/answer"):
+            return 404, {"error": f"Unknown endpoint {url.path}"}
+
+        rag = self.rag
+        if rag is None:
+            return 503, {"error": "Indexes are still loading"}
+        query = str(params.get("query", params.get("q", ""))).strip()
+        if not query:
+            return 400, {"error": "Missing query"}
+        try:
+            num_results = int(params.get("num_results", params.get("k", 5 if url.path == "/search" else 3)))
+        except ValueError:
+            return 400, {"error": "num_results must be an integer"}
+
+        if url.path == "/search":
+            results = await rag.search(query, num_results)
+            return 200, {"query": query, "results": [result_json(result) for result in results]}
+
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+        try:
+            answer = await rag.answer_query(query, num_results)
+        except Exception as e:
+            logger.error(f"Error answering query: {str(e)}")
+            return 502, {"error": f"Error querying the model: {str(e)}"}
+        return 200, {
+            "query": query,
+            "answer": answer["answer"],
+            "cached": answer["cached"],
+            "sources": [result_json(result) for result in answer["results"]]
+        }
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Serve HTTP/1.1 requests on one connection, keeping it open between requests."""
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                try:
+                    method, target, version = request_line.decode('latin-1').split()
+                except ValueError:
+                    await self._respond(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+
+                headers = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode('latin-1').partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                length = int(headers.get("content-length", 0) or 0)
+                if length > MAX_BODY_BYTES:
+                    await self._respond(writer, 413, {"error": "Request body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                request = asyncio.create_task(self.dispatch(method.upper(), target, body))
+                if not await self._finish_unless_disconnected(request, reader):
+                    logger.info(f"Client disconnected; cancelled {method} {target}")
+                    break
+                try:
+                    status, payload = request.result()
+                except Exception as e:
+                    logger.error(f"Error handling {method} {target}: {str(e)}")
+                    status, payload = 500, {"error": str(e)}
+                await self._respond(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            writer.close()
+
+    async def _finish_unless_disconnected(self, request: asyncio.Task, reader: asyncio.StreamReader) -> bool:
+        """Wait for ``request``, cancelling it if the client closes the connection first."""
+        while not request.done():
+            await asyncio.wait({request}, timeout=DISCONNECT_POLL_SECONDS)
+            if not request.done() and reader.at_eof():
+                request.cancel()
+                try:
+                    await request
+                except asyncio.CancelledError:
+                    pass
+                return False
+        return True
+
+    async def _respond(self, writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool) -> None:
+        body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        writer.write((
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            f"Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(body)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n"
+        ).encode('latin-1') + body)
+        await writer.drain()
+
+    async def serve(self) -> None:
+        """Load the indexes, then serve until cancelled."""
+        await self.load()
+        self._server = await asyncio.start_server(self.handle_connection, self.host, self.port)
+        watcher = asyncio.create_task(self.watch()) if self.reload_interval else None
+        logger.info(f"RAG server listening on http://{self.host}:{self.port}")
+        try:
+            async with self._server:
+                await self._server.serve_forever()
+        finally:
+            if watcher is not None:
+                watcher.cancel()
+            if self.rag is not None:
+                self.rag.save_caches()
+                await self.rag.aclose()
+            self.executor.shutdown(wait=False, cancel_futures=True)
+
+def result_json(result: Dict[str, Any]) -> Dict[str, Any]:
+    """JSON form of one search result."""
+    chunk = result["chunk"]
+    return {
+        "document": chunk["document"],
+        "id": chunk["id"],
+        "content": chunk["content"],
+        "score": result.get("score"),
+        "similarity": result.get("similarity"),
+        "sources": result.get("sources", []),
+        "duplicates": len(chunk.get("duplicates", []))
+    }
+
+def run_server(factory: Callable[[], Any], chunks_dir: Path, config: Dict[str, Any]) -> None:
+    """Run a RAGServer built from config until interrupted."""
+    server = RAGServer.from_config(factory, chunks_dir, config)
+    try:
+        asyncio.run(server.serve())
+    except KeyboardInterrupt:
+        logger.info("RAG server stopped")
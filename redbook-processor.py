@@ -7,6 +7,8 @@ import shutil
 import hashlib
 from pathlib import Path
 import json
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
 from datetime import datetime
 import torch
 from tqdm import tqdm
@@ -14,16 +16,19 @@ from tqdm import tqdm
 # Import Docling
 try:
     from docling.document_converter import DocumentConverter, PdfFormatOption
-    from docling.datamodel.base_models import InputFormat
+    from docling.datamodel.base_models import InputFormat, ConversionStatus
     from docling.datamodel.pipeline_options import PdfPipelineOptions
     from docling.datamodel.settings import settings
-    from docling_core.types.doc import ImageRefMode
+    from docling_core.types.doc import ImageRefMode, DoclingDocument, TableItem
 except ImportError:
     print("Error: Docling not installed. Please install with 'pip install docling'")
     sys.exit(1)
 
 # Import GPU check
 from check_gpu import check_gpu
+from chunk_store import shard_path, write_shard
+from chunking import chunk_blocks, get_token_counter
+from config_loader import ConfigLoader
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
@@ -50,15 +55,40 @@ def setup_gpu_optimizations():
         return True
     return False
 
-def get_file_hash(file_path):
-    """Calculate MD5 hash of file to track changes"""
-    hasher = hashlib.md5()
+# Manifest entries record a BLAKE2 hash plus size and mtime; older entries carry only an MD5 hash
+HASH_ALGORITHM = "blake2b"
+LEGACY_HASH_ALGORITHM = "md5"
+MANIFEST_FLUSH_SECONDS = 60
+
+def get_file_hashes(file_path, algorithms=(HASH_ALGORITHM,)):
+    """Hash a file with each of ``algorithms`` in a single read. Returns {algorithm: hex digest}."""
+    hashers = {algorithm: hashlib.blake2b(digest_size=16) if algorithm == "blake2b" else hashlib.new(algorithm)
+               for algorithm in algorithms}
     with open(file_path, 'rb') as f:
-        buf = f.read(65536)
+        buf = f.read(1 << 20)
         while len(buf) > 0:
-            hasher.update(buf)
-            buf = f.read(65536)
-    return hasher.hexdigest()
+            for hasher in hashers.values():
+                hasher.update(buf)
+            buf = f.read(1 << 20)
+    return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+def check_manifest_entry(entry, file_path):
+    """Compare a file with its manifest entry. Returns (unchanged, hash, file_stats).
+    
+    A successful entry with the same size and mtime is trusted without reading
+    the file. Otherwise the file is hashed once, also with MD5 when the entry
+    predates BLAKE2, so touched or copied files are still recognized.
+    """
+    stat = os.stat(file_path)
+    file_stats = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+    if (entry and entry.get("hash_algorithm") == HASH_ALGORITHM and
+            entry.get("size") == stat.st_size and entry.get("mtime_ns") == stat.st_mtime_ns):
+        return entry["success"], entry["hash"], file_stats
+    
+    previous_algorithm = entry.get("hash_algorithm", LEGACY_HASH_ALGORITHM) if entry else HASH_ALGORITHM
+    hashes = get_file_hashes(file_path, {HASH_ALGORITHM, previous_algorithm})
+    unchanged = bool(entry) and entry["success"] and hashes[previous_algorithm] == entry["hash"]
+    return unchanged, hashes[HASH_ALGORITHM], file_stats
 
 def load_processing_manifest(manifest_file):
     """Load or create processing manifest to track processed files"""
@@ -69,32 +99,30 @@ def load_processing_manifest(manifest_file):
         except json.JSONDecodeError:
             logger.warning("Manifest file corrupted, creating new one")
     
-    # Create default manifest
-    manifest = {
+    # Create default manifest; it is written once processing results come in
+    return {
         "processed_files": {},
         "last_update": datetime.now().isoformat()
     }
-    
-    # Create directory if needed
-    manifest_file.parent.mkdir(parents=True, exist_ok=True)
-    
-    # Save and return
-    with open(manifest_file, 'w') as f:
-        json.dump(manifest, f, indent=2)
-    
-    return manifest
 
-def update_manifest(manifest, manifest_file, file_path, hash_value, success):
-    """Update the processing manifest with file information"""
+def update_manifest(manifest, file_path, hash_value, success, file_stats):
+    """Update the processing manifest with file information (in memory; see save_manifest)"""
     manifest["processed_files"][str(file_path)] = {
         "hash": hash_value,
+        "hash_algorithm": HASH_ALGORITHM,
+        **file_stats,
         "last_processed": datetime.now().isoformat(),
         "success": success
     }
+
+def save_manifest(manifest, manifest_file):
+    """Write the manifest in one atomic replace, so a crash never leaves it half-written"""
     manifest["last_update"] = datetime.now().isoformat()
-    
-    with open(manifest_file, 'w') as f:
+    manifest_file.parent.mkdir(parents=True, exist_ok=True)
+    tmp_file = manifest_file.with_suffix(manifest_file.suffix + ".tmp")
+    with open(tmp_file, 'w') as f:
         json.dump(manifest, f, indent=2)
+    os.replace(tmp_file, manifest_file)
 
 def setup_directories(base_dir):
     """Create necessary directories if they don't exist."""
@@ -113,42 +141,64 @@ def setup_directories(base_dir):
     
     return paths
 
-def chunk_document(text, chunk_size=1000, overlap=100):
-    """Chunk document text with overlap."""
-    chunks = []
-    start = 0
-    text_length = len(text)
-    
-    while start < text_length:
-        end = min(start + chunk_size, text_length)
-        if end < text_length and end - start == chunk_size:
-            # Find the last period or newline to make a clean break
-            last_period = text.rfind('.', start, end)
-            last_newline = text.rfind('\n', start, end)
-            break_point = max(last_period, last_newline)
-            
-            if break_point > start:
-                end = break_point + 1  # Include the period or newline
-        
-        chunk = text[start:end].strip()
-        if chunk:  # Only add non-empty chunks
-            chunks.append(chunk)
-        
-        # Move start position for next chunk, considering overlap
-        start = end - overlap if end < text_length else text_length
+def document_blocks(document):
+    """Yield (page_no, kind, text) for each text item of a Docling document, in reading order.
     
-    return chunks
+    Kind is "heading" for titles and section headers, "table" for tables
+    (exported as Markdown) and "text" for everything else.
+    """
+    for item, _level in document.iterate_items():
+        if not getattr(item, "prov", None):
+            continue
+        if isinstance(item, TableItem):
+            kind, text = "table", item.export_to_markdown(document)
+        else:
+            label = getattr(item, "label", "")
+            kind = "heading" if label in ("title", "section_header") else "text"
+            text = getattr(item, "text", "")
+        if text:
+            yield item.prov[0].page_no, kind, text
 
-def process_pdf(pdf_path, output_dir, has_gpu):
-    """Process a single PDF using Docling and create chunks. Also creates individual subfolder."""
-    pdf_filename = os.path.basename(pdf_path)
-    doc_name = os.path.splitext(pdf_filename)[0]
-    
-    logger.info(f"Processing {pdf_filename}...")
-    
-    # Configure Docling
+def get_page_count(pdf_path):
+    """Return the number of pages in a PDF without converting it."""
+    import pypdfium2
+    pdf = pypdfium2.PdfDocument(str(pdf_path))
+    try:
+        return len(pdf)
+    finally:
+        pdf.close()
+
+def plan_page_ranges(pdf_path, split_threshold, pages_per_part):
+    """Split a large PDF into 1-based inclusive page ranges, or return None to convert it whole."""
+    if not split_threshold or not pages_per_part:
+        return None
+    try:
+        page_count = get_page_count(pdf_path)
+    except Exception as e:
+        logger.warning(f"Could not count pages of {Path(pdf_path).name}, converting it whole: {str(e)}")
+        return None
+    if page_count <= split_threshold:
+        return None
+    return [(start, min(start + pages_per_part - 1, page_count))
+            for start in range(1, page_count + 1, pages_per_part)]
+
+def merge_documents(parts):
+    """Merge converted page-range parts back into one document, in page order."""
+    ordered = sorted(parts, key=lambda part: part["page_range"][0])
+    return DoclingDocument.concatenate([DoclingDocument.model_validate(part["document"]) for part in ordered])
+
+def build_converter(has_gpu, timeout=None, page_images=True):
+    """Create a Docling DocumentConverter configured for this machine."""
+    # Configure Docling; page images are only rendered when an export embeds them
     pipeline_options = PdfPipelineOptions()
-    pipeline_options.generate_page_images = True
+    pipeline_options.generate_page_images = page_images
+    
+    # Stop converting a document that runs past the per-PDF timeout
+    if timeout:
+        try:
+            pipeline_options.document_timeout = timeout
+        except (AttributeError, ValueError) as e:
+            logger.info(f"Could not set pipeline_options.document_timeout: {str(e)}")
     
     # Use GPU if available - handle different Docling API versions
     if has_gpu:
@@ -172,72 +222,222 @@ def process_pdf(pdf_path, output_dir, has_gpu):
         logger.info("Environment variables for GPU are set globally")
     
     # Initialize Document Converter
-    doc_converter = DocumentConverter(
+    return DocumentConverter(
         format_options={
             InputFormat.PDF: PdfFormatOption(pipeline_options=pipeline_options)
         }
     )
+
+def warm_up_converter(doc_converter):
+    """Load the PDF pipeline's layout and OCR models up front. Returns the time taken."""
+    start_time = time.time()
+    if hasattr(doc_converter, "initialize_pipeline"):
+        doc_converter.initialize_pipeline(InputFormat.PDF)
+    init_time = time.time() - start_time
+    logger.info(f"Docling PDF pipeline initialized in {init_time:.2f} seconds")
+    return init_time
+
+def convert_pdf(pdf_path, doc_converter, page_range=None):
+    """Convert a PDF, or a 1-based inclusive range of its pages. Returns (document, seconds)."""
+    start_time = time.time()
+    if page_range:
+        result = doc_converter.convert(pdf_path, page_range=page_range)
+    else:
+        result = doc_converter.convert(pdf_path)
+    processing_time = time.time() - start_time
+    
+    if result.status != ConversionStatus.SUCCESS:
+        raise RuntimeError(f"conversion finished with status {result.status} after {processing_time:.0f} seconds")
+    return result.document, processing_time
+
+# Export formats: file suffix and writer for each
+EXPORT_FORMATS = {
+    "json": (".json", lambda document, path, options: document.save_as_json(path, image_mode=ImageRefMode.PLACEHOLDER)),
+    "html": (".html", lambda document, path, options: document.save_as_html(path, image_mode=ImageRefMode(options["html_images"]))),
+    "markdown": (".md", lambda document, path, options: document.save_as_markdown(path, image_mode=ImageRefMode.PLACEHOLDER)),
+    "text": (".txt", lambda document, path, options: document.save_as_markdown(path, image_mode=ImageRefMode.PLACEHOLDER, strict_text=True))
+}
+
+# Export formats and chunking settings passed from main() to every conversion
+DEFAULT_OUTPUT_OPTIONS = {
+    "formats": ["json", "html", "markdown", "text"],
+    "html_images": "embedded",
+    "chunk_tokens": 256,
+    "chunk_overlap_tokens": 32,
+    "tokenizer": None
+}
+
+def needs_page_images(output_options):
+    """Page images are only worth rendering when the HTML export embeds them."""
+    return "html" in output_options["formats"] and output_options["html_images"] == "embedded"
+
+def export_document(document, doc_subdir, doc_name, output_options):
+    """Render and write each requested format exactly once. Returns bytes and seconds per format."""
+    stats = {}
+    for fmt in output_options["formats"]:
+        suffix, writer = EXPORT_FORMATS[fmt]
+        path = doc_subdir / f"{doc_name}{suffix}"
+        start_time = time.time()
+        writer(document, path, output_options)
+        stats[fmt] = {
+            "bytes": path.stat().st_size,
+            "seconds": time.time() - start_time
+        }
+    return stats
+
+def save_document(document, pdf_path, output_dir, processing_time, output_options=None):
+    """Export a converted document into its own subfolder and write its chunks."""
+    output_options = output_options or DEFAULT_OUTPUT_OPTIONS
+    pdf_filename = os.path.basename(pdf_path)
+    doc_name = os.path.splitext(pdf_filename)[0]
+    
+    docs_dir = output_dir["docs"]
+    chunks_dir = output_dir["chunks"]
+    
+    # Create individual document subfolder and save the requested formats
+    doc_subdir = docs_dir / doc_name
+    doc_subdir.mkdir(exist_ok=True)
+    exports = export_document(document, doc_subdir, doc_name, output_options)
+    
+    # Create chunks sized in tokens, keeping the pages each chunk came from
+    chunks = chunk_blocks(document_blocks(document), get_token_counter(output_options["tokenizer"]),
+                          output_options["chunk_tokens"], output_options["chunk_overlap_tokens"])
+    
+    # Save chunks as one JSONL shard per document, replacing any earlier shard atomically
+    chunk_count = write_shard(shard_path(chunks_dir, doc_name), (
+        {"id": f"chunk_{i:04d}", "content": chunk["text"], "tokens": chunk["tokens"],
+         "page_start": chunk["page_start"], "page_end": chunk["page_end"]}
+        for i, chunk in enumerate(chunks)
+    ))
+    
+    return {
+        "name": doc_name,
+        "path": str(pdf_path),
+        "chunks": chunk_count,
+        "processing_time": processing_time,
+        "exports": exports
+    }
+
+def process_pdf(pdf_path, output_dir, doc_converter, output_options=None):
+    """Process a single PDF using Docling and create chunks."""
+    pdf_filename = os.path.basename(pdf_path)
+    
+    logger.info(f"Processing {pdf_filename}...")
     
     # Convert the document
     try:
-        start_time = time.time()
-        result = doc_converter.convert(pdf_path)
-        processing_time = time.time() - start_time
+        document, processing_time = convert_pdf(pdf_path, doc_converter)
         logger.info(f"Processed {pdf_filename} in {processing_time:.2f} seconds")
+        return save_document(document, pdf_path, output_dir, processing_time, output_options)
         
-        # Save in multiple formats
-        docs_dir = output_dir["docs"]
-        chunks_dir = output_dir["chunks"]
-        
-        # Save document in various formats
-        result.document.save_as_json(docs_dir / f"{doc_name}.json", image_mode=ImageRefMode.PLACEHOLDER)
-        result.document.save_as_html(docs_dir / f"{doc_name}.html", image_mode=ImageRefMode.EMBEDDED)
-        result.document.save_as_markdown(docs_dir / f"{doc_name}.md", image_mode=ImageRefMode.PLACEHOLDER)
-        result.document.save_as_markdown(docs_dir / f"{doc_name}.txt", image_mode=ImageRefMode.PLACEHOLDER, strict_text=True)
-        
-        # Get plain text for chunking
-        text_content = result.document.export_to_markdown(strict_text=True)
-        
-        # Create chunks
-        chunks = chunk_document(text_content)
-        
-        # Save chunks
-        with open(chunks_dir / f"{doc_name}_chunks.json", 'w', encoding='utf-8') as f:
-            json.dump({
-                "document": pdf_filename,
-                "total_chunks": len(chunks),
-                "chunks": chunks
-            }, f, ensure_ascii=False, indent=2)
-        
-        # Create individual document subfolder
-        doc_subdir = docs_dir / doc_name
-        doc_subdir.mkdir(exist_ok=True)
-        
-        # Save document to individual subfolder too
-        result.document.save_as_json(doc_subdir / f"{doc_name}.json", image_mode=ImageRefMode.PLACEHOLDER)
-        result.document.save_as_html(doc_subdir / f"{doc_name}.html", image_mode=ImageRefMode.EMBEDDED)
-        result.document.save_as_markdown(doc_subdir / f"{doc_name}.md", image_mode=ImageRefMode.PLACEHOLDER)
-        result.document.save_as_markdown(doc_subdir / f"{doc_name}.txt", image_mode=ImageRefMode.PLACEHOLDER, strict_text=True)
-        
-        # Save individual chunk files for easier processing
-        chunk_dir = chunks_dir / doc_name
-        chunk_dir.mkdir(exist_ok=True)
-        
-        for i, chunk in enumerate(chunks):
-            with open(chunk_dir / f"chunk_{i:04d}.txt", 'w', encoding='utf-8') as f:
-                f.write(chunk)
-        
+    except Exception as e:
+        logger.error(f"Error processing {pdf_filename}: {str(e)}")
+        return None
+
+# Converter owned by each worker process in the process pool
+_worker_converter = None
+_worker_init_time = 0.0
+
+def init_worker(has_gpu, timeout, page_images=True):
+    """Process pool initializer: build and warm up this worker's own converter."""
+    global _worker_converter, _worker_init_time
+    _worker_converter = build_converter(has_gpu, timeout, page_images)
+    _worker_init_time = warm_up_converter(_worker_converter)
+
+def convert_in_worker(pdf_file, directories, page_range=None, output_options=None):
+    """Process one PDF, or convert one page range of it, inside a pool worker."""
+    if page_range is None:
+        result = process_pdf(pdf_file, directories, _worker_converter, output_options)
+        if result:
+            result["worker_init_time"] = _worker_init_time
+        return result
+    
+    try:
+        document, processing_time = convert_pdf(pdf_file, _worker_converter, page_range)
+        logger.info(f"Converted pages {page_range[0]}-{page_range[1]} of {Path(pdf_file).name} in {processing_time:.2f} seconds")
+        # Send the document back as plain data; it is rebuilt and merged in the parent
         return {
-            "name": doc_name,
-            "path": str(pdf_path),
-            "chunks": len(chunks),
-            "processing_time": processing_time
+            "page_range": page_range,
+            "document": document.export_to_dict(),
+            "processing_time": processing_time,
+            "worker_init_time": _worker_init_time
         }
-        
     except Exception as e:
-        logger.error(f"Error processing {pdf_filename}: {str(e)}")
+        logger.error(f"Error converting pages {page_range[0]}-{page_range[1]} of {Path(pdf_file).name}: {str(e)}")
         return None
 
+def process_in_pool(jobs, directories, has_gpu, workers, timeout, on_result, output_options=None):
+    """Convert PDFs in a process pool, passing each (pdf_file, file_hash, result) to on_result in the parent.
+    
+    Each job is (pdf_file, file_hash, page_range). Jobs with a page range are
+    parts of one large PDF; once all parts of a PDF are back they are merged
+    into one document, exported and chunked in the parent.
+    
+    A PDF that crashes its worker breaks the whole pool, so any jobs left
+    unfinished are retried once, each in its own single-worker pool. That way
+    one bad PDF cannot take the others' work down with it.
+    """
+    split_pdfs = {}
+    for pdf_file, file_hash, page_range in jobs:
+        if page_range is not None:
+            split_pdfs.setdefault(pdf_file, {"expected": 0, "parts": [], "failed": False})["expected"] += 1
+    
+    def collect(pdf_file, file_hash, page_range, result):
+        if page_range is None:
+            on_result(pdf_file, file_hash, result)
+            return
+        
+        state = split_pdfs[pdf_file]
+        if result is None:
+            state["failed"] = True
+        else:
+            state["parts"].append(result)
+        state["expected"] -= 1
+        if state["expected"] > 0:
+            return
+        
+        merged = None
+        if not state["failed"]:
+            try:
+                document = merge_documents(state["parts"])
+                processing_time = sum(part["processing_time"] for part in state["parts"])
+                merged = save_document(document, pdf_file, directories, processing_time, output_options)
+                merged["parts"] = len(state["parts"])
+                merged["worker_init_time"] = max(part["worker_init_time"] for part in state["parts"])
+            except Exception as e:
+                logger.error(f"Error merging {Path(pdf_file).name}: {str(e)}")
+        on_result(pdf_file, file_hash, merged)
+    
+    groups = [jobs]
+    for attempt in range(2):
+        retry = []
+        for group in groups:
+            with ProcessPoolExecutor(max_workers=min(workers, len(group)), initializer=init_worker,
+                                     initargs=(has_gpu, timeout, needs_page_images(output_options or DEFAULT_OUTPUT_OPTIONS))) as executor:
+                futures = {executor.submit(convert_in_worker, pdf_file, directories, page_range, output_options): (pdf_file, file_hash, page_range)
+                           for pdf_file, file_hash, page_range in group}
+                for future in tqdm(as_completed(futures), total=len(futures), desc="Processing PDFs"):
+                    pdf_file, file_hash, page_range = futures[future]
+                    try:
+                        result = future.result()
+                    except BrokenProcessPool:
+                        retry.append((pdf_file, file_hash, page_range))
+                        continue
+                    except Exception as e:
+                        logger.error(f"Error processing {Path(pdf_file).name}: {str(e)}")
+                        result = None
+                    collect(pdf_file, file_hash, page_range, result)
+        
+        if not retry:
+            break
+        if attempt == 0:
+            logger.warning(f"A worker process crashed; retrying {len(retry)} unfinished jobs one at a time")
+            groups = [[job] for job in retry]
+        else:
+            for pdf_file, file_hash, page_range in retry:
+                logger.error(f"Worker crashed while processing {Path(pdf_file).name}")
+                collect(pdf_file, file_hash, page_range, None)
+
 def main():
     parser = argparse.ArgumentParser(description="Process IBM Redbooks PDFs using Docling")
     parser.add_argument("--data_dir", type=str, default="C:\\Users\\jamie\\OneDrive\\Documents\\Redbooks RAG", 
@@ -245,8 +445,37 @@ def main():
     parser.add_argument("--specific_pdf", type=str, help="Process a specific PDF file only")
     parser.add_argument("--source_dir", type=str, default="C:\\Users\\jamie\\OneDrive\\Documents\\Redbooks PDF Content",
                         help="Source directory containing PDF files")
+    parser.add_argument("--config", type=str, default="config.yaml",
+                        help="Path to configuration file")
+    parser.add_argument("--workers", type=int,
+                        help="Number of PDF conversion processes (default: processing.max_workers)")
+    parser.add_argument("--formats", type=str,
+                        help="Comma-separated export formats from json, html, markdown, text (default: export.formats)")
     args = parser.parse_args()
     
+    # Load configuration if available; defaults are used otherwise
+    config = ConfigLoader(args.config).config if Path(args.config).exists() else {}
+    processing_config = config.get('processing', {})
+    timeout = processing_config.get('timeout')
+    pdf_config = config.get('pdf_processing', {})
+    split_threshold = pdf_config.get('split_pdfs_over_pages', 0)
+    pages_per_part = pdf_config.get('pages_per_part', 0)
+    export_config = config.get('export', {})
+    output_options = {
+        "formats": args.formats.split(',') if args.formats else export_config.get('formats', DEFAULT_OUTPUT_OPTIONS["formats"]),
+        "html_images": export_config.get('html_images', DEFAULT_OUTPUT_OPTIONS["html_images"]),
+        "chunk_tokens": pdf_config.get('chunk_tokens', DEFAULT_OUTPUT_OPTIONS["chunk_tokens"]),
+        "chunk_overlap_tokens": pdf_config.get('chunk_overlap_tokens', DEFAULT_OUTPUT_OPTIONS["chunk_overlap_tokens"]),
+        "tokenizer": pdf_config.get('tokenizer')
+    }
+    unknown_formats = set(output_options["formats"]) - set(EXPORT_FORMATS)
+    if unknown_formats:
+        logger.error(f"Unknown export formats: {', '.join(sorted(unknown_formats))}")
+        return
+    if split_threshold and not hasattr(DoclingDocument, "concatenate"):
+        logger.warning("This docling-core version cannot merge documents; large PDFs will be converted whole")
+        split_threshold = 0
+    
     # Check for GPU
     has_gpu, gpu_info = check_gpu()
     
@@ -255,6 +484,14 @@ def main():
         setup_gpu_optimizations()
         logger.info(f"GPU optimizations applied for {gpu_info}")
     
+    # Worker processes each hold their own models, so only fan out automatically on CPU
+    if args.workers is not None:
+        workers = max(1, args.workers)
+    elif processing_config.get('parallel_processing', False) and not has_gpu:
+        workers = max(1, processing_config.get('max_workers', 1))
+    else:
+        workers = 1
+    
     # Setup directories
     directories = setup_directories(args.data_dir)
     
@@ -285,33 +522,89 @@ def main():
     
     logger.info(f"Found {len(pdf_files)} PDF files to process")
     
-    # Process each PDF, but skip already processed files that haven't changed
-    results = []
+    # Skip already processed files that haven't changed; only new or touched files are hashed
+    pending = []
     skipped = []
+    file_stats = {}
+    manifest_changed = False
+    scan_start = time.time()
     
-    for pdf_file in tqdm(pdf_files, desc="Processing PDFs"):
-        file_hash = get_file_hash(pdf_file)
+    for pdf_file in pdf_files:
         pdf_path = Path(pdf_file)
+        entry = manifest["processed_files"].get(str(pdf_file))
+        unchanged, file_hash, file_stats[pdf_file] = check_manifest_entry(entry, pdf_file)
         
-        # Check if file is already processed and hash matches
-        if (str(pdf_file) in manifest["processed_files"] and 
-            manifest["processed_files"][str(pdf_file)]["hash"] == file_hash and
-            manifest["processed_files"][str(pdf_file)]["success"]):
+        if unchanged:
+            # Record the current size, mtime and BLAKE2 hash so the next run takes the fast path
+            if entry.get("hash") != file_hash or any(entry.get(k) != v for k, v in file_stats[pdf_file].items()):
+                entry.update({"hash": file_hash, "hash_algorithm": HASH_ALGORITHM, **file_stats[pdf_file]})
+                manifest_changed = True
             logger.info(f"Skipping {pdf_path.name} (already processed)")
             skipped.append(pdf_file)
             continue
         
-        logger.info(f"Processing {pdf_path.name}")
-        
-        # Process the PDF
-        result = process_pdf(pdf_file, directories, has_gpu)
-        
-        # Update the manifest
-        update_manifest(manifest, manifest_file, pdf_file, file_hash, result is not None)
-        
+        pending.append((pdf_file, file_hash))
+    
+    logger.info(f"Checked {len(pdf_files)} PDFs against the manifest in {time.time() - scan_start:.2f} seconds")
+    if manifest_changed:
+        save_manifest(manifest, manifest_file)
+    
+    results = []
+    init_time = 0.0
+    last_manifest_save = time.time()
+    
+    def on_result(pdf_file, file_hash, result):
+        # Runs in the main process only, so manifest updates never race
+        nonlocal last_manifest_save
+        update_manifest(manifest, pdf_file, file_hash, result is not None, file_stats[pdf_file])
+        if time.time() - last_manifest_save > MANIFEST_FLUSH_SECONDS:
+            save_manifest(manifest, manifest_file)
+            last_manifest_save = time.time()
         if result:
             results.append(result)
     
+    # Large PDFs are split into page ranges so their parts convert in parallel
+    jobs = []
+    for pdf_file, file_hash in pending:
+        page_ranges = plan_page_ranges(pdf_file, split_threshold, pages_per_part) if workers > 1 else None
+        if page_ranges:
+            logger.info(f"Splitting {Path(pdf_file).name} into {len(page_ranges)} page ranges")
+            jobs.extend((pdf_file, file_hash, page_range) for page_range in page_ranges)
+        else:
+            jobs.append((pdf_file, file_hash, None))
+    workers = min(workers, len(jobs)) if jobs else 1
+    
+    try:
+        if workers > 1:
+            if has_gpu:
+                logger.warning(f"Running {workers} workers; each loads its own models onto the GPU")
+            logger.info(f"Converting {len(pending)} PDFs ({len(jobs)} jobs) with {workers} worker processes")
+            process_in_pool(jobs, directories, has_gpu, workers, timeout, on_result, output_options)
+            init_time = max((r.get("worker_init_time", 0.0) for r in results), default=0.0)
+        elif pending:
+            # Build and warm up a single converter, reused for every PDF in the batch
+            doc_converter = build_converter(has_gpu, timeout, needs_page_images(output_options))
+            init_time = warm_up_converter(doc_converter)
+        
+            for pdf_file, file_hash in tqdm(pending, desc="Processing PDFs"):
+                logger.info(f"Processing {Path(pdf_file).name}")
+                on_result(pdf_file, file_hash, process_pdf(pdf_file, directories, doc_converter, output_options))
+    finally:
+        # One batched write for everything processed since the last flush
+        if pending:
+            save_manifest(manifest, manifest_file)
+    
+    # Each PDF used to pay for its own converter initialization; now each worker pays once
+    init_time_saved = init_time * max(len(jobs) - workers, 0)
+    
+    # Total bytes written and time spent per export format
+    export_totals = {}
+    for result in results:
+        for fmt, stats in result.get("exports", {}).items():
+            totals = export_totals.setdefault(fmt, {"bytes": 0, "seconds": 0.0})
+            totals["bytes"] += stats["bytes"]
+            totals["seconds"] += stats["seconds"]
+    
     # Save processing summary
     with open(directories["processed"] / "processing_summary.json", 'w') as f:
         json.dump({
@@ -319,12 +612,20 @@ def main():
             "total_files": len(results),
             "skipped_files": len(skipped),
             "gpu_used": has_gpu,
+            "workers": workers,
             "gpu_info": gpu_info if has_gpu else None,
+            "converter_init_time": init_time,
+            "converter_init_time_saved": init_time_saved,
+            "exports": export_totals,
             "documents": results
         }, f, indent=2)
     
     logger.info(f"Successfully processed {len(results)} out of {len(pdf_files) - len(skipped)} attempted PDFs")
     logger.info(f"Skipped {len(skipped)} files that were already processed")
+    for fmt, totals in export_totals.items():
+        logger.info(f"Export {fmt}: {totals['bytes'] / 1e6:.1f} MB written in {totals['seconds']:.2f} seconds")
+    if pending:
+        logger.info(f"Reusing one converter saved about {init_time_saved:.1f} seconds of model initialization")
 
 if __name__ == "__main__":
     main()
@@ -4,9 +4,12 @@ import json
 import logging
 from pathlib import Path
 import re
-from operator import itemgetter
+import time
 from colorama import init, Fore, Style
 
+import chunk_store
+from lexical_index import BM25Index
+
 # Initialize colorama for colored terminal output
 init()
 
@@ -15,53 +18,12 @@ logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(
 logger = logging.getLogger(__name__)
 
 def load_chunks(chunks_dir):
-    """Load all chunk files from the chunks directory."""
-    chunks = []
-    # Look for chunk files in all subdirectories
-    chunk_files = list(Path(chunks_dir).rglob("chunk_*.txt"))
-
-    # Sort files for consistent loading
-    chunk_files.sort()
-
-    for chunk_file in chunk_files:
-        # Get the document name from the parent directory
-        doc_name = chunk_file.parent.parent.name
-        with open(chunk_file, 'r', encoding='utf-8') as f:
-            content = f.read()
-            chunks.append({
-                "document": doc_name,
-                "id": chunk_file.stem,
-                "content": content,
-                "file_path": str(chunk_file)
-            })
-
-    logger.info(f"Loaded {len(chunks)} chunks from {len(set([c['document'] for c in chunks]))} documents")
-    return chunks
-
-def search_chunks(chunks, query, num_results=5):
-    """Search for chunks that match the query terms."""
-    # Break query into terms
-    query_terms = re.findall(r'\b\w+\b', query.lower())
-
-    # Score each chunk based on term frequency
-    scored_chunks = []
-    for chunk in chunks:
-        content = chunk["content"].lower()
-        score = 0
-
-        # Count occurrences of each term
-        for term in query_terms:
-            term_count = len(re.findall(r'\b' + re.escape(term) + r'\b', content))
-            score += term_count
-
-        # Only include chunks with at least one match
-        if score > 0:
-            scored_chunks.append((chunk, score))
-
-    # Sort by score in descending order
-    scored_chunks.sort(key=itemgetter(1), reverse=True)
-
-    return [chunk for chunk, score in scored_chunks[:num_results]]
+    """Load all chunks from the chunks directory, reading per-document shards where present."""
+    return chunk_store.load_chunks(Path(chunks_dir))
+
+def search_chunks(index, chunks, query, num_results=5):
+    """Search for chunks that match the query terms, ranked by BM25."""
+    return [chunks[position] for position, score in index.search(query, num_results)]
 
 def highlight_terms(text, terms):
     """Highlight search terms in the text."""
@@ -75,6 +37,7 @@ def highlight_terms(text, terms):
 def interactive_query(chunks_dir):
     """Run an interactive query session."""
     chunks = load_chunks(chunks_dir)
+    index = BM25Index.load_or_build(chunks, Path(chunks_dir).parent / "lexical_index.json")
 
     print(f"{Fore.GREEN}=== IBM Redbooks Simple RAG Query System ==={Style.RESET_ALL}")
     print(f"Loaded {len(chunks)} chunks from {len(set([c['document'] for c in chunks]))} documents")
@@ -91,14 +54,16 @@ def interactive_query(chunks_dir):
             continue
 
         # Search for relevant chunks
-        results = search_chunks(chunks, query)
+        start_time = time.perf_counter()
+        results = search_chunks(index, chunks, query)
+        search_ms = (time.perf_counter() - start_time) * 1000
 
         if not results:
             print(f"{Fore.RED}No results found for your query.{Style.RESET_ALL}")
             continue
 
         # Display results
-        print(f"\n{Fore.GREEN}Found {len(results)} relevant chunks:{Style.RESET_ALL}\n")
+        print(f"\n{Fore.GREEN}Found {len(results)} relevant chunks in {search_ms:.2f} ms:{Style.RESET_ALL}\n")
 
         query_terms = re.findall(r'\b\w+\b', query.lower())
 